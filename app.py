@@ -1,12 +1,13 @@
 import os
 import logging
+import tempfile
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
 from sqlalchemy.orm import DeclarativeBase
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'DEBUG'))
 
 class Base(DeclarativeBase):
     pass
@@ -17,10 +18,10 @@ mail = Mail()
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    from services.identity import load_identity
+    return load_identity(db.session, int(user_id))
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
     # Configuration
@@ -34,12 +35,96 @@ def create_app():
         "pool_pre_ping": True,
     }
 
+    # Availability store
+    app.config['AVAILABILITY_MATERIALIZED'] = os.environ.get('AVAILABILITY_MATERIALIZED', '0') == '1'
+    app.config['AVAILABILITY_HORIZON_DAYS'] = int(os.environ.get('AVAILABILITY_HORIZON_DAYS', 14))
+
+    # Available-slot responses stay valid (and cacheable by ETag) for this many seconds
+    app.config['SLOT_ETAG_WINDOW'] = int(os.environ.get('SLOT_ETAG_WINDOW', 300))
+
+    # Dashboard calendar feed: per-window cache (seconds) and longest window served
+    app.config['CALENDAR_CACHE_TTL'] = int(os.environ.get('CALENDAR_CACHE_TTL', 30))
+    app.config['CALENDAR_MAX_RANGE_DAYS'] = int(os.environ.get('CALENDAR_MAX_RANGE_DAYS', 62))
+
+    # .ics subscription feed: days of history and of future included, client max-age (seconds)
+    app.config['CALENDAR_FEED_LOOKBACK_DAYS'] = int(os.environ.get('CALENDAR_FEED_LOOKBACK_DAYS', 30))
+    app.config['CALENDAR_FEED_LOOKAHEAD_DAYS'] = int(os.environ.get('CALENDAR_FEED_LOOKAHEAD_DAYS', 180))
+    app.config['CALENDAR_FEED_MAX_AGE'] = int(os.environ.get('CALENDAR_FEED_MAX_AGE', 300))
+
+    # Admin dashboard stats cache (seconds)
+    app.config['STATS_CACHE_TTL'] = int(os.environ.get('STATS_CACHE_TTL', 60))
+
+    # Logged-in user snapshot used by load_user (seconds, 0 disables)
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+
+    # Password hashing: werkzeug method string and hashing processes (0 = inline)
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 30))
+
+    # Doctor list snapshot: seconds between checks of the shared version, and longest kept
+    app.config['DOCTOR_DIRECTORY_CHECK_INTERVAL'] = float(os.environ.get('DOCTOR_DIRECTORY_CHECK_INTERVAL', 5))
+    app.config['DOCTOR_DIRECTORY_TTL'] = int(os.environ.get('DOCTOR_DIRECTORY_TTL', 60))
+
+    # Chat upstream (OpenAI) endpoint, concurrency and timeouts, in seconds.
+    # OPENAI_BASE_URL can point at perf/fake_openai.py for offline load tests.
+    app.config['OPENAI_BASE_URL'] = os.environ.get('OPENAI_BASE_URL')
+    app.config['CHAT_UPSTREAM_WORKERS'] = int(os.environ.get('CHAT_UPSTREAM_WORKERS', 8))
+    app.config['CHAT_UPSTREAM_TIMEOUT'] = float(os.environ.get('CHAT_UPSTREAM_TIMEOUT', 10))
+    app.config['CHAT_TTS_WORKERS'] = int(os.environ.get('CHAT_TTS_WORKERS', 4))
+    app.config['CHAT_TTS_TIMEOUT'] = float(os.environ.get('CHAT_TTS_TIMEOUT', 20))
+    app.config['CHAT_LLM_CACHE_TTL'] = int(os.environ.get('CHAT_LLM_CACHE_TTL', 600))
+
+    # Chatbot flow state: 'memory' (per process) or 'database' (shared by workers)
+    app.config['CHAT_STATE_BACKEND'] = os.environ.get('CHAT_STATE_BACKEND', 'memory')
+    app.config['CHAT_STATE_TTL'] = int(os.environ.get('CHAT_STATE_TTL', 1800))
+
+    # Synthesized speech cache shared by the workers on this host
+    app.config['TTS_CACHE_DIR'] = os.environ.get(
+        'TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'doctor_appointment_tts'))
+    app.config['TTS_CACHE_MEMORY_MB'] = int(os.environ.get('TTS_CACHE_MEMORY_MB', 16))
+    app.config['TTS_CACHE_DISK_MB'] = int(os.environ.get('TTS_CACHE_DISK_MB', 512))
+
+    # Request threads per worker; keep in sync with gunicorn --threads
+    app.config['WEB_THREADS'] = int(os.environ.get('WEB_THREADS', 8))
+
+    # Live appointment events over SSE: 'memory' (single worker) or 'postgres' (LISTEN/NOTIFY).
+    # Each open stream holds a request thread, so at most a quarter of them go to streams
+    # (2 per worker with the shipped 8 threads; raise WEB_THREADS and gunicorn --threads
+    # together for more). Dashboards refused with 503 retry with a backoff, so live updates
+    # rotate between them as streams reach EVENTS_STREAM_TIMEOUT. A closed stream is only
+    # noticed on the next write, so keepalives are frequent.
+    app.config['EVENTS_BACKEND'] = os.environ.get('EVENTS_BACKEND', 'memory')
+    app.config['EVENTS_MAX_STREAMS'] = int(os.environ.get(
+        'EVENTS_MAX_STREAMS', max(1, app.config['WEB_THREADS'] // 4)))
+    app.config['EVENTS_STREAM_TIMEOUT'] = float(os.environ.get('EVENTS_STREAM_TIMEOUT', 300))
+    app.config['EVENTS_KEEPALIVE'] = float(os.environ.get('EVENTS_KEEPALIVE', 5))
+
+    # Instrumentation
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
     # Mail configuration
-    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-    app.config['MAIL_PORT'] = 587
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', '1') == '1'
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_USERNAME'))
+
+    # Notification outbox worker (`flask notifications-worker`); delays in seconds
+    app.config['NOTIFICATION_BATCH_SIZE'] = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 100))
+    app.config['NOTIFICATION_POLL_INTERVAL'] = float(os.environ.get('NOTIFICATION_POLL_INTERVAL', 5))
+    app.config['NOTIFICATION_MAX_ATTEMPTS'] = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+    app.config['NOTIFICATION_RETRY_DELAY'] = float(os.environ.get('NOTIFICATION_RETRY_DELAY', 30))
+    app.config['NOTIFICATION_RETRY_MAX_DELAY'] = float(os.environ.get('NOTIFICATION_RETRY_MAX_DELAY', 3600))
+
+    # Reminder scheduler (`python scheduler.py`): seconds between ticks, rows per scan
+    app.config['REMINDER_INTERVAL'] = float(os.environ.get('REMINDER_INTERVAL', 60))
+    app.config['REMINDER_BATCH_SIZE'] = int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+
+    if config:
+        app.config.update(config)
 
     # Initialize extensions
     db.init_app(app)
@@ -47,18 +132,28 @@ def create_app():
     login_manager.login_view = 'auth.login'
     mail.init_app(app)
 
+    import metrics
+    metrics.init_app(app, db)
+
     # Register blueprints
     from routes.auth import auth_bp
     from routes.admin import admin_bp
     from routes.doctor import doctor_bp
     from routes.patient import patient_bp
+    from routes.chat import chat_bp
+    from routes.events import events_bp
+    from routes.calendar import calendar_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(doctor_bp, url_prefix='/doctor')
     app.register_blueprint(patient_bp, url_prefix='/patient')
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(calendar_bp)
 
-    with app.app_context():
-        db.create_all()
+    from commands import register_commands
+    register_commands(app)
 
+    # Schema changes are applied with `flask db-upgrade`, not on every worker boot
     return app
\ No newline at end of file
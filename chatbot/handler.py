@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
-from flask import session
-from models import User, Appointment, DoctorSchedule
+from models import User, DoctorSchedule
+from services.slot_store import get_available_slots, schedule_changed
+from services.booking import BookingError, book_appointment
+from services import doctor_directory
+from services.passwords import PasswordHashBusy
+from services.chat_state import chat_state, from_minutes, pack_slots, to_minutes, unpack_slots
 from app import db
-from werkzeug.security import generate_password_hash
 
 class ChatbotHandler:
     def __init__(self):
@@ -16,11 +19,15 @@ class ChatbotHandler:
         self.current_step = {}
 
     def process_message(self, message, user=None):
-        """Process incoming chat messages and return appropriate responses"""
+        """Process incoming chat messages and return appropriate responses.
+
+        Responses are deterministic and sent as-is unless they carry
+        ``'polish': True``; see chatbot.policy.
+        """
         message = message.lower().strip()
 
         # Check if we're in the middle of a flow
-        if session.get('chat_flow'):
+        if chat_state.get('chat_flow'):
             return self.continue_flow(message, user)
 
         # Handle commands
@@ -30,7 +37,8 @@ class ChatbotHandler:
 
         return {
             'message': "I didn't understand that. Type 'help' to see what I can do!",
-            'options': ['help']
+            'options': ['help'],
+            'polish': True
         }
 
     def show_help(self, message=None, user=None):
@@ -66,10 +74,10 @@ class ChatbotHandler:
     def handle_registration(self, message, user=None):
         """Start registration flow"""
         if user:
-            return {'message': "You're already logged in!"}
+            return {'message': "You're already logged in!", 'polish': True}
 
-        session['chat_flow'] = 'register'
-        session['register_data'] = {}
+        chat_state['chat_flow'] = 'register'
+        chat_state['register_data'] = {}
 
         return {
             'message': "Let's get you registered! What's your email address?",
@@ -79,9 +87,9 @@ class ChatbotHandler:
     def handle_login(self, message, user=None):
         """Start login flow"""
         if user:
-            return {'message': "You're already logged in!"}
+            return {'message': "You're already logged in!", 'polish': True}
 
-        session['chat_flow'] = 'login'
+        chat_state['chat_flow'] = 'login'
         return {
             'message': "Please enter your email address:",
             'expect_input': True
@@ -92,19 +100,21 @@ class ChatbotHandler:
         if not user:
             return {
                 'message': "Please login first to book an appointment",
-                'options': ['login', 'register']
+                'options': ['login', 'register'],
+                'polish': True
             }
 
         if user.role != 'patient':
-            return {'message': "Only patients can book appointments"}
+            return {'message': "Only patients can book appointments", 'polish': True}
 
         # Get available doctors
-        doctors = User.query.filter_by(role='doctor').all()
+        doctors = doctor_directory.get_doctors(db.session)
         if not doctors:
-            return {'message': "Sorry, no doctors are available at the moment"}
+            return {'message': "Sorry, no doctors are available at the moment", 'polish': True}
 
-        session['chat_flow'] = 'booking'
-        session['booking_data'] = {}
+        chat_state['chat_flow'] = 'booking'
+        chat_state['booking_data'] = {}
+        chat_state['context'] = {'doctors': [d.id for d in doctors]}
 
         # Format doctor options
         doctor_options = [f"{idx + 1}. Dr. {doctor.first_name} {doctor.last_name}"
@@ -121,9 +131,9 @@ class ChatbotHandler:
     def handle_schedule(self, message, user=None):
         """Start schedule management flow"""
         if not user or user.role != 'doctor':
-            return {'message': "Only doctors can manage schedules"}
+            return {'message': "Only doctors can manage schedules", 'polish': True}
 
-        session['chat_flow'] = 'schedule'
+        chat_state['chat_flow'] = 'schedule'
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
         return {
@@ -135,7 +145,7 @@ class ChatbotHandler:
 
     def continue_flow(self, message, user):
         """Continue an ongoing chat flow"""
-        flow = session.get('chat_flow')
+        flow = chat_state.get('chat_flow')
 
         if flow == 'register':
             return self.continue_registration(message)
@@ -150,7 +160,7 @@ class ChatbotHandler:
 
     def continue_registration(self, message):
         """Handle registration flow steps"""
-        data = session.get('register_data', {})
+        data = chat_state.get('register_data', {})
 
         if 'email' not in data:
             # Validate email
@@ -168,7 +178,7 @@ class ChatbotHandler:
                 }
 
             data['email'] = message
-            session['register_data'] = data
+            chat_state['register_data'] = data
 
             return {
                 'message': "Great! Now enter your first name:",
@@ -177,7 +187,7 @@ class ChatbotHandler:
 
         if 'first_name' not in data:
             data['first_name'] = message
-            session['register_data'] = data
+            chat_state['register_data'] = data
 
             return {
                 'message': "And your last name:",
@@ -186,7 +196,7 @@ class ChatbotHandler:
 
         if 'last_name' not in data:
             data['last_name'] = message
-            session['register_data'] = data
+            chat_state['register_data'] = data
 
             return {
                 'message': "Are you a patient or a doctor? (Type 1 or 2)\n"
@@ -199,7 +209,7 @@ class ChatbotHandler:
         if 'role' not in data:
             role = 'patient' if message == '1' else 'doctor'
             data['role'] = role
-            session['register_data'] = data
+            chat_state['register_data'] = data
 
             return {
                 'message': "Finally, choose a password:",
@@ -215,13 +225,15 @@ class ChatbotHandler:
                 last_name=data['last_name'],
                 role=data['role']
             )
-            user.password_hash = generate_password_hash(message)
+            user.set_password(message)
 
             db.session.add(user)
             db.session.commit()
+            if user.role == 'doctor':
+                doctor_directory.bump()
 
-            session.pop('chat_flow')
-            session.pop('register_data')
+            chat_state.pop('chat_flow')
+            chat_state.pop('register_data')
 
             return {
                 'message': "Registration successful! Please login:",
@@ -232,25 +244,35 @@ class ChatbotHandler:
 
     def continue_login(self, message):
         """Handle login flow steps"""
-        if 'email' not in session:
-            session['email'] = message
+        if 'email' not in chat_state:
+            chat_state['email'] = message
             return {
                 'message': "Please enter your password:",
                 'expect_input': True,
                 'password': True
             }
 
-        email = session.pop('email')
+        email = chat_state.pop('email')
         user = User.query.filter_by(email=email).first()
 
-        if not user or not user.check_password(message):
-            session.pop('chat_flow')
+        try:
+            valid = user is not None and user.check_password(message)
+        except PasswordHashBusy:
+            chat_state.pop('chat_flow')
+            return {
+                'message': "The server is busy right now. Please try logging in again:",
+                'options': ['login']
+            }
+
+        if not valid:
+            chat_state.pop('chat_flow')
             return {
                 'message': "Invalid email or password. Please try again:",
                 'options': ['login']
             }
 
-        session.pop('chat_flow')
+        db.session.commit()  # keeps a re-hashed password
+        chat_state.pop('chat_flow')
         return {
             'message': f"Welcome back {user.first_name}!",
             'login_success': True,
@@ -259,40 +281,29 @@ class ChatbotHandler:
 
     def continue_booking(self, message, user):
         """Handle booking flow steps"""
-        data = session.get('booking_data', {})
+        data = chat_state.get('booking_data', {})
 
         if 'doctor_id' not in data:
             try:
                 idx = int(message) - 1
-                doctors = session.get('context', {}).get('doctors', [])
+                doctors = chat_state.get('context', {}).get('doctors', [])
                 doctor_id = doctors[idx]
 
                 data['doctor_id'] = doctor_id
-                session['booking_data'] = data
+                chat_state['booking_data'] = data
 
                 # Get available slots
-                doctor = User.query.get(doctor_id)
+                doctor = doctor_directory.get_doctor(db.session, doctor_id)
                 today = datetime.utcnow().date()
                 next_week = today + timedelta(days=7)
 
-                available_slots = []
-                current_date = today
-
-                while current_date <= next_week:
-                    schedules = DoctorSchedule.query.filter_by(
-                        doctor_id=doctor_id,
-                        day_of_week=current_date.weekday()
-                    ).all()
-
-                    for schedule in schedules:
-                        slots = schedule.get_available_slots(current_date)
-                        available_slots.extend(slots)
-
-                    current_date += timedelta(days=1)
+                available_slots = get_available_slots(
+                    doctor_id, today, next_week, not_before=datetime.utcnow()
+                )
 
                 if not available_slots:
-                    session.pop('chat_flow')
-                    session.pop('booking_data')
+                    chat_state.pop('chat_flow')
+                    chat_state.pop('booking_data')
                     return {
                         'message': f"Sorry, Dr. {doctor.first_name} {doctor.last_name} "
                                  "has no available slots in the next 7 days",
@@ -305,7 +316,7 @@ class ChatbotHandler:
                     for idx, slot in enumerate(available_slots)
                 ]
 
-                session['context']['slots'] = available_slots
+                chat_state['context']['slots'] = pack_slots(available_slots)
 
                 return {
                     'message': "Please select an available time slot by entering its number:\n" +
@@ -323,11 +334,11 @@ class ChatbotHandler:
         if 'datetime' not in data:
             try:
                 idx = int(message) - 1
-                slots = session.get('context', {}).get('slots', [])
+                slots = unpack_slots(chat_state.get('context', {}).get('slots', []))
                 slot_datetime = slots[idx]
 
-                data['datetime'] = slot_datetime
-                session['booking_data'] = data
+                data['datetime'] = to_minutes(slot_datetime)
+                chat_state['booking_data'] = data
 
                 return {
                     'message': "Any notes for the doctor? (Type 'no' if none)",
@@ -344,38 +355,38 @@ class ChatbotHandler:
         try:
             notes = None if message.lower() == 'no' else message
 
-            appointment = Appointment(
-                doctor_id=data['doctor_id'],
-                patient_id=user.id,
-                datetime=data['datetime'],
-                notes=notes,
-                status='pending'
-            )
+            slot = from_minutes(data['datetime'])
+            book_appointment(data['doctor_id'], user.id, slot, notes=notes)
 
-            db.session.add(appointment)
-            db.session.commit()
-
-            session.pop('chat_flow')
-            session.pop('booking_data')
-            session.pop('context')
+            chat_state.pop('chat_flow')
+            chat_state.pop('booking_data')
+            chat_state.pop('context')
 
             return {
                 'message': "Appointment requested! You'll be notified once the doctor confirms.",
                 'options': ['view']
             }
 
+        except BookingError as e:
+            chat_state.pop('chat_flow')
+            chat_state.pop('booking_data')
+            chat_state.pop('context')
+            return {
+                'message': f"{e}. Please choose another slot.",
+                'options': ['book']
+            }
         except Exception as e:
             return {'message': "Booking failed. Please try again later."}
 
     def continue_schedule(self, message, user):
         """Handle schedule management flow"""
-        data = session.get('schedule_data', {})
+        data = chat_state.get('schedule_data', {})
 
         if 'day' not in data:
             try:
                 day = int(message) - 1
                 data['day'] = day
-                session['schedule_data'] = data
+                chat_state['schedule_data'] = data
 
                 return {
                     'message': "Enter start time (HH:MM, 24-hour format):",
@@ -394,7 +405,7 @@ class ChatbotHandler:
                 start_time = f"{hour:02d}:{minute:02d}"
 
                 data['start_time'] = start_time
-                session['schedule_data'] = data
+                chat_state['schedule_data'] = data
 
                 return {
                     'message': "Enter end time (HH:MM, 24-hour format):",
@@ -413,7 +424,7 @@ class ChatbotHandler:
                 end_time = f"{hour:02d}:{minute:02d}"
 
                 data['end_time'] = end_time
-                session['schedule_data'] = data
+                chat_state['schedule_data'] = data
 
                 return {
                     'message': "Select appointment duration:\n"
@@ -461,10 +472,11 @@ class ChatbotHandler:
                 }
 
             db.session.add(schedule)
+            schedule_changed(user.id, schedule.day_of_week)
             db.session.commit()
 
-            session.pop('chat_flow')
-            session.pop('schedule_data')
+            chat_state.pop('chat_flow')
+            chat_state.pop('schedule_data')
 
             return {
                 'message': "Schedule added successfully!",
@@ -0,0 +1,54 @@
+"""Which chatbot replies may be rewritten by the LLM, and a cache for the rewrites.
+
+Flow steps (prompts for credentials, numbered doctor/slot/day menus,
+"Enter start time (HH:MM)" and the like) carry exact text and options the
+user must follow, so they are returned verbatim. Only replies the handler
+marks with ``'polish': True`` go upstream, and their rewrites are cached
+on a normalized prompt for ``CHAT_LLM_CACHE_TTL`` seconds.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def should_polish(response):
+    """Only explicitly marked, non-sensitive replies are eligible for rewriting"""
+    return bool(response.get('polish')) and not response.get('password')
+
+def strip_policy(response):
+    """Drop the internal policy marker before the reply goes to the client"""
+    return {key: value for key, value in response.items() if key != 'polish'}
+
+def normalize_prompt(user_message, chatbot_message):
+    user_message = ' '.join(user_message.lower().split())
+    chatbot_message = ' '.join(chatbot_message.split())
+    return hashlib.sha256(f'{user_message}\0{chatbot_message}'.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Small thread-safe LRU with a per-entry TTL"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
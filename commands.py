@@ -0,0 +1,93 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('rebuild-availability')
+@with_appcontext
+def rebuild_availability_command():
+    """Recompute the materialized availability slots for every doctor"""
+    from services import slot_store
+
+    count = slot_store.rebuild()
+    click.echo(f'Rebuilt {count} doctor-day availability rows')
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Apply pending schema migrations"""
+    from migrations.runner import upgrade
+
+    applied = upgrade()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(applied)}")
+    else:
+        click.echo('Database is up to date')
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """List known schema migrations and whether they are applied"""
+    from migrations.runner import status
+
+    for version, description, applied in status():
+        click.echo(f"{'applied' if applied else 'pending'}  {version}  {description}")
+
+@click.command('db-check-plans')
+@click.option('--doctors', default=200, help='Synthetic doctors to seed')
+@click.option('--patients', default=2000, help='Synthetic patients to seed')
+@click.option('--appointments', default=100000, help='Synthetic appointments to seed')
+@with_appcontext
+def db_check_plans_command(doctors, patients, appointments):
+    """Check that hot dashboard and slot queries use an index (seeded data is rolled back)"""
+    from migrations.plan_check import check_plans
+
+    results = check_plans(doctors=doctors, patients=patients, appointments=appointments)
+    for name, uses_index, plan in results:
+        click.echo(f"{'ok  ' if uses_index else 'FAIL'}  {name}: {plan}")
+
+    if not all(uses_index for _, uses_index, _ in results):
+        raise SystemExit(1)
+
+@click.command('seed-data')
+@click.option('--doctors', default=100)
+@click.option('--patients', default=2000)
+@click.option('--appointments', default=50000)
+@click.option('--skew', default=1.1, help='Zipf exponent for bookings per doctor and patient')
+@click.option('--password', default='password', help='Password given to every seeded user')
+@click.option('--prefix', default='seed', help='Email prefix, so repeated runs do not collide')
+@with_appcontext
+def seed_data_command(doctors, patients, appointments, skew, password, prefix):
+    """Bulk-insert a synthetic, skewed dataset for benchmarking"""
+    from perf.seed import seed
+
+    seed(doctors=doctors, patients=patients, appointments=appointments, skew=skew,
+         password=password, prefix=prefix, echo=click.echo)
+
+@click.command('notifications-worker')
+@click.option('--once', is_flag=True, help='Exit once the outbox has no more due notifications')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to sleep when the outbox is drained')
+@with_appcontext
+def notifications_worker_command(once, poll_interval):
+    """Deliver queued notification emails in batches"""
+    from services.notifications import pending_count, run_worker
+
+    handled = run_worker(once=once, poll_interval=poll_interval)
+    click.echo(f'Handled {handled} notifications, {pending_count()} still pending')
+
+@click.command('reminder-scheduler')
+@click.option('--once', is_flag=True, help='Run a single tick and exit')
+@with_appcontext
+def reminder_scheduler_command(once):
+    """Queue 24h and 1h appointment reminders every REMINDER_INTERVAL seconds"""
+    from services.reminders import run_scheduler
+
+    run_scheduler(once=once)
+
+def register_commands(app):
+    app.cli.add_command(rebuild_availability_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_status_command)
+    app.cli.add_command(db_check_plans_command)
+    app.cli.add_command(seed_data_command)
+    app.cli.add_command(notifications_worker_command)
+    app.cli.add_command(reminder_scheduler_command)
@@ -3,4 +3,10 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    from migrations.runner import upgrade
+
+    # The development server keeps the old convenience of creating the schema on start
+    with app.app_context():
+        upgrade()
+
     app.run(host="0.0.0.0", port=5000, debug=True)
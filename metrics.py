@@ -0,0 +1,158 @@
+"""Per-request SQL and latency instrumentation.
+
+Hooks SQLAlchemy cursor events and the Flask request/template signals to
+record, per endpoint and blueprint, the statement count, DB time, template
+render time and total latency of every request. The histograms are kept
+in process memory and rendered in the Prometheus text format by
+``admin.metrics``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            snapshot = [(labels, list(counts), total, count)
+                        for labels, (counts, total, count) in self.series.items()]
+
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock:
+            snapshot = sorted(self.values.items())
+        for labels, value in snapshot:
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value}')
+        return lines
+
+REQUEST_LABELS = ('blueprint', 'endpoint')
+
+requests_total = Counter(
+    'http_requests_total', 'Requests handled.', ('blueprint', 'endpoint', 'status'))
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS, REQUEST_LABELS)
+request_db_duration = Histogram(
+    'http_request_db_seconds', 'Time spent executing SQL per request.', LATENCY_BUCKETS, REQUEST_LABELS)
+request_render_duration = Histogram(
+    'http_request_render_seconds', 'Time spent rendering templates per request.', LATENCY_BUCKETS, REQUEST_LABELS)
+request_statements = Histogram(
+    'http_request_sql_statements', 'SQL statements executed per request.', STATEMENT_BUCKETS, REQUEST_LABELS)
+
+REGISTRY = [requests_total, request_duration, request_db_duration, request_render_duration, request_statements]
+
+
+def render_metrics():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_start' in g:
+        context._metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is not None and has_request_context():
+        g.metrics_db_time += time.perf_counter() - start
+        g.metrics_statements += 1
+
+def _before_render_template(sender, template, context, **extra):
+    if 'metrics_start' in g:
+        g.metrics_render_start = time.perf_counter()
+
+def _template_rendered(sender, template, context, **extra):
+    start = g.pop('metrics_render_start', None)
+    if start is not None:
+        g.metrics_render_time += time.perf_counter() - start
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_db_time = 0.0
+    g.metrics_render_time = 0.0
+    g.metrics_statements = 0
+
+def _record_response(response):
+    if 'metrics_start' in g:
+        g.metrics_status = response.status_code
+    return response
+
+def _finish_request(exc):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+
+    endpoint = request.endpoint or 'unmatched'
+    labels = (request.blueprint or '', endpoint)
+    status = g.get('metrics_status', 500)
+
+    requests_total.inc(labels + (str(status),))
+    request_duration.observe(labels, time.perf_counter() - start)
+    request_db_duration.observe(labels, g.metrics_db_time)
+    request_render_duration.observe(labels, g.metrics_render_time)
+    request_statements.observe(labels, g.metrics_statements)
+
+def init_app(app, db):
+    """Install the request, template and engine hooks on an app"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
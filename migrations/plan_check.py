@@ -0,0 +1,167 @@
+"""Query-plan check for the hot dashboard and slot queries.
+
+Seeds a synthetic dataset inside a transaction, runs EXPLAIN on each hot
+query and reports whether the planner chose an index for it. Everything
+is rolled back afterwards, so it is safe to point at a real database.
+"""
+import json
+import random
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, select, text, tuple_
+from app import db
+from models import Appointment, DoctorSchedule, User
+
+
+def hot_queries(doctor_id, patient_id):
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    week_end = today + timedelta(days=8)
+
+    return {
+        'doctor.dashboard today': select(Appointment).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.datetime >= today,
+            Appointment.datetime < tomorrow
+        ).order_by(Appointment.datetime),
+        'doctor.dashboard upcoming': select(Appointment).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.datetime >= tomorrow,
+            Appointment.status != 'cancelled'
+        ).order_by(Appointment.datetime).limit(5),
+        'doctor.dashboard pending': select(Appointment).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.status == 'pending'
+        ),
+        'doctor.today_appointments_count': select(func.count()).select_from(Appointment).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.datetime >= today,
+            Appointment.datetime < tomorrow,
+            Appointment.status != 'cancelled'
+        ),
+        'patient.dashboard': select(Appointment).where(
+            Appointment.patient_id == patient_id,
+            Appointment.datetime >= now
+        ).order_by(Appointment.datetime),
+        'admin.dashboard recent': select(Appointment).order_by(Appointment.created_at.desc()).limit(5),
+        'admin.view_appointments page': select(Appointment).where(
+            tuple_(Appointment.datetime, Appointment.id) < (now, 2 ** 31 - 1)
+        ).order_by(Appointment.datetime.desc(), Appointment.id.desc()).limit(51),
+        'availability booked slots': select(Appointment.doctor_id, Appointment.datetime).where(
+            Appointment.doctor_id.in_([doctor_id]),
+            Appointment.datetime >= today,
+            Appointment.datetime < week_end,
+            Appointment.status != 'cancelled'
+        ),
+        'availability schedules': select(DoctorSchedule).where(
+            DoctorSchedule.doctor_id.in_([doctor_id])
+        ),
+        'reminders window scan': select(Appointment.id, Appointment.status).where(
+            tuple_(Appointment.datetime, Appointment.id) > (now, 0),
+            Appointment.datetime < now + timedelta(hours=24)
+        ).order_by(Appointment.datetime, Appointment.id).limit(500),
+    }
+
+def seed(connection, doctors=200, patients=2000, appointments=100000):
+    """Bulk insert a synthetic dataset and return one (doctor_id, patient_id) pair"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    users = User.__table__
+
+    def insert_users(role, count):
+        rows = [{
+            'email': f'plan-check-{role}-{i}@example.invalid',
+            'password_hash': '!',
+            'first_name': role.title(),
+            'last_name': str(i),
+            'role': role,
+            'created_at': now,
+        } for i in range(count)]
+        connection.execute(users.insert(), rows)
+        return [row.id for row in connection.execute(
+            select(users.c.id).where(users.c.email.like(f'plan-check-{role}-%'))
+        )]
+
+    doctor_ids = insert_users('doctor', doctors)
+    patient_ids = insert_users('patient', patients)
+
+    connection.execute(DoctorSchedule.__table__.insert(), [{
+        'doctor_id': doctor_id,
+        'day_of_week': day,
+        'start_time': time(9),
+        'end_time': time(17),
+        'slot_duration': 30,
+    } for doctor_id in doctor_ids for day in range(5)])
+
+    statuses = ['pending', 'confirmed', 'confirmed', 'cancelled']
+    taken = set()
+    batch = []
+    for _ in range(appointments):
+        doctor_id = rng.choice(doctor_ids)
+        when = now + timedelta(minutes=30 * rng.randint(-50000, 5000))
+        status = rng.choice(statuses)
+        # Respect the unique active-slot index: repeats of a slot are cancelled ones
+        if (doctor_id, when) in taken:
+            status = 'cancelled'
+        elif status != 'cancelled':
+            taken.add((doctor_id, when))
+
+        batch.append({
+            'doctor_id': doctor_id,
+            'patient_id': rng.choice(patient_ids),
+            'datetime': when,
+            'status': status,
+            'created_at': now - timedelta(minutes=rng.randint(0, 500000)),
+        })
+        if len(batch) == 5000:
+            connection.execute(Appointment.__table__.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(Appointment.__table__.insert(), batch)
+
+    return doctor_ids[0], patient_ids[0]
+
+def explain(connection, statement):
+    """Return ``(uses_index, plan_text)`` for a statement"""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+
+    if connection.dialect.name == 'postgresql':
+        plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        node_types = []
+
+        def walk(node):
+            node_types.append((node['Node Type'], node.get('Relation Name')))
+            for child in node.get('Plans', []):
+                walk(child)
+
+        walk(plan[0]['Plan'])
+        uses_index = not any(node == 'Seq Scan' for node, _ in node_types)
+        return uses_index, ', '.join(f'{node} on {relation}' if relation else node
+                                     for node, relation in node_types)
+
+    rows = connection.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).fetchall()
+    details = [row[-1] for row in rows]
+    uses_index = all(
+        'USING' in detail for detail in details if detail.startswith('SCAN')
+    )
+    return uses_index, '; '.join(details)
+
+def check_plans(**seed_sizes):
+    """Seed, explain every hot query and roll back.
+
+    Returns a list of ``(name, uses_index, plan_text)`` tuples.
+    """
+    results = []
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            doctor_id, patient_id = seed(connection, **seed_sizes)
+            connection.execute(text('ANALYZE'))
+            for name, statement in hot_queries(doctor_id, patient_id).items():
+                uses_index, plan = explain(connection, statement)
+                results.append((name, uses_index, plan))
+        finally:
+            transaction.rollback()
+    return results
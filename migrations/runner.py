@@ -0,0 +1,62 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select, text
+from app import db
+from migrations.versions import MIGRATIONS
+
+# Arbitrary constant identifying the migration advisory lock
+MIGRATION_LOCK_KEY = 72_001_004
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('version', String(32), primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def applied_versions(connection):
+    metadata.create_all(bind=connection, checkfirst=True)
+    return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+def pending_migrations():
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+def upgrade():
+    """Apply every pending migration, each in its own transaction.
+
+    On Postgres an advisory lock serializes concurrent runs, so instances
+    starting together (the deploy runs ``flask db-upgrade`` before
+    gunicorn) apply each migration once. Returns the list of versions
+    that were applied.
+    """
+    with db.engine.connect() as lock_connection:
+        locked = db.engine.dialect.name == 'postgresql'
+        if locked:
+            lock_connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            lock_connection.commit()
+        try:
+            applied = []
+            for version, description, migrate in pending_migrations():
+                with db.engine.begin() as connection:
+                    migrate(connection)
+                    connection.execute(schema_migrations.insert().values(
+                        version=version,
+                        description=description,
+                        applied_at=datetime.utcnow()
+                    ))
+                applied.append(version)
+            return applied
+        finally:
+            if locked:
+                lock_connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+                lock_connection.commit()
+
+def status():
+    """Return ``(version, description, applied)`` for every known migration"""
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    return [(version, description, version in applied) for version, description, _ in MIGRATIONS]
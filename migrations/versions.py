@@ -0,0 +1,161 @@
+"""Ordered schema migrations.
+
+Each migration is a ``(version, description, upgrade)`` tuple where
+``upgrade`` receives an open connection inside the migration transaction.
+Append new migrations to the end of ``MIGRATIONS``; never reorder or edit
+one that has already shipped.
+"""
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, Time
+
+
+def initial_schema(connection):
+    """The schema as first deployed, spelled out so it never follows models.py.
+
+    Tables that predate migrations (the app used to call ``create_all`` on
+    boot) are left alone.
+    """
+    metadata = MetaData()
+    Table(
+        'specialization', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+    )
+    Table(
+        'user', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('email', String(120), unique=True, nullable=False),
+        Column('password_hash', String(256), nullable=False),
+        Column('first_name', String(50), nullable=False),
+        Column('last_name', String(50), nullable=False),
+        Column('role', String(20), nullable=False),
+        Column('created_at', DateTime),
+        Column('specialization_id', Integer, ForeignKey('specialization.id')),
+    )
+    Table(
+        'appointment', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('doctor_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('patient_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('datetime', DateTime, nullable=False),
+        Column('status', String(20)),
+        Column('notes', Text),
+        Column('created_at', DateTime),
+    )
+    Table(
+        'doctor_schedule', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('doctor_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('day_of_week', Integer, nullable=False),
+        Column('start_time', Time, nullable=False),
+        Column('end_time', Time, nullable=False),
+        Column('slot_duration', Integer),
+    )
+    Table(
+        'notification', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('title', String(100), nullable=False),
+        Column('message', Text, nullable=False),
+        Column('read', Boolean),
+        Column('created_at', DateTime),
+    )
+    metadata.create_all(bind=connection, checkfirst=True)
+
+def create_indexes(connection, *names):
+    """Create the named indexes declared on the models, skipping existing ones"""
+    import models
+
+    tables = [models.User.__table__, models.Appointment.__table__, models.DoctorSchedule.__table__,
+              models.Notification.__table__]
+    indexes = {index.name: index for table in tables for index in table.indexes}
+    for name in names:
+        indexes[name].create(bind=connection, checkfirst=True)
+
+def hot_path_indexes(connection):
+    create_indexes(
+        connection,
+        'ix_appointment_doctor_datetime_status',
+        'ix_appointment_patient_datetime',
+        'ix_appointment_created_at',
+        'ix_appointment_doctor_pending',
+        'ix_doctor_schedule_doctor_day',
+        'ix_user_role_specialization',
+    )
+
+def appointment_keyset_index(connection):
+    create_indexes(connection, 'ix_appointment_datetime_id')
+
+def unique_active_slot(connection):
+    from sqlalchemy import func, select
+    from models import Appointment
+
+    duplicates = connection.execute(
+        select(Appointment.doctor_id, Appointment.datetime)
+        .where(Appointment.status != 'cancelled')
+        .group_by(Appointment.doctor_id, Appointment.datetime)
+        .having(func.count() > 1)
+    ).fetchall()
+    if duplicates:
+        raise RuntimeError(
+            f'{len(duplicates)} doctor/slot pairs have more than one active appointment; '
+            'cancel the extras before applying this migration'
+        )
+    create_indexes(connection, 'uq_appointment_doctor_slot_active')
+
+def chat_session_table(connection):
+    from models import ChatSession
+    ChatSession.__table__.create(bind=connection, checkfirst=True)
+
+def notification_outbox(connection):
+    from sqlalchemy import inspect, text
+
+    existing = {column['name'] for column in inspect(connection).get_columns('notification')}
+    columns = [
+        ('delivery_status', 'VARCHAR(20)'),
+        ('attempts', 'INTEGER DEFAULT 0'),
+        ('next_attempt_at', 'TIMESTAMP'),
+        ('sent_at', 'TIMESTAMP'),
+        ('last_error', 'TEXT'),
+    ]
+    for name, ddl in columns:
+        if name not in existing:
+            connection.execute(text(f'ALTER TABLE notification ADD COLUMN {name} {ddl}'))
+    create_indexes(connection, 'ix_notification_delivery_due')
+
+def reminder_cursor_table(connection):
+    from models import ReminderCursor
+    ReminderCursor.__table__.create(bind=connection, checkfirst=True)
+
+def doctor_version_table(connection):
+    from models import DoctorVersion
+    DoctorVersion.__table__.create(bind=connection, checkfirst=True)
+
+def availability_slot_table(connection):
+    # Databases set up while 0001 still ran create_all already have it
+    from models import AvailabilitySlot
+    AvailabilitySlot.__table__.create(bind=connection, checkfirst=True)
+
+def calendar_feed_version(connection):
+    from sqlalchemy import text
+    connection.execute(text(
+        'ALTER TABLE "user" ADD COLUMN calendar_feed_version INTEGER NOT NULL DEFAULT 0'
+    ))
+
+def cache_version_table(connection):
+    from models import CacheVersion
+    CacheVersion.__table__.create(bind=connection, checkfirst=True)
+    connection.execute(CacheVersion.__table__.insert().values(name='doctor_directory', version=0))
+
+MIGRATIONS = [
+    ('0001', 'initial schema', initial_schema),
+    ('0002', 'composite and partial indexes for dashboard and slot queries', hot_path_indexes),
+    ('0003', 'keyset pagination index for the admin appointment list', appointment_keyset_index),
+    ('0004', 'unique active appointment per doctor and slot', unique_active_slot),
+    ('0005', 'server-side chatbot session state', chat_session_table),
+    ('0006', 'notification email outbox columns', notification_outbox),
+    ('0007', 'reminder scheduler high-water marks', reminder_cursor_table),
+    ('0008', 'per-doctor change versions for conditional GETs', doctor_version_table),
+    ('0009', 'materialized availability slots', availability_slot_table),
+    ('0010', 'revocable calendar feed links', calendar_feed_version),
+    ('0011', 'shared doctor directory version', cache_version_table),
+]
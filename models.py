@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.passwords import hash_password, needs_rehash, verify_password
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,11 +15,23 @@ class User(UserMixin, db.Model):
     # Doctor specific fields
     specialization_id = db.Column(db.Integer, db.ForeignKey('specialization.id'))
 
+    # Signed into .ics feed links; bumping it revokes every link handed out so far
+    calendar_feed_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_user_role_specialization', 'role', 'specialization_id'),
+    )
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify ``password``; a hash made with outdated parameters is replaced (commit to keep it)"""
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.password_hash = hash_password(password)
+        return True
 
 class Specialization(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -38,6 +50,20 @@ class Appointment(db.Model):
     doctor = db.relationship('User', foreign_keys=[doctor_id])
     patient = db.relationship('User', foreign_keys=[patient_id])
 
+    __table_args__ = (
+        db.Index('ix_appointment_doctor_datetime_status', 'doctor_id', 'datetime', 'status'),
+        db.Index('ix_appointment_patient_datetime', 'patient_id', 'datetime'),
+        db.Index('ix_appointment_created_at', 'created_at'),
+        db.Index('ix_appointment_datetime_id', 'datetime', 'id'),
+        db.Index('ix_appointment_doctor_pending', 'doctor_id', 'datetime',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+        # At most one active (pending or confirmed) appointment per doctor and slot
+        db.Index('uq_appointment_doctor_slot_active', 'doctor_id', 'datetime', unique=True,
+                 postgresql_where=db.text("status != 'cancelled'"),
+                 sqlite_where=db.text("status != 'cancelled'")),
+    )
+
 class DoctorSchedule(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -48,6 +74,10 @@ class DoctorSchedule(db.Model):
 
     doctor = db.relationship('User', backref='schedules')
 
+    __table_args__ = (
+        db.Index('ix_doctor_schedule_doctor_day', 'doctor_id', 'day_of_week'),
+    )
+
     def has_overlap(self, other_schedule):
         """Check if this schedule overlaps with another schedule"""
         if self.day_of_week != other_schedule.day_of_week:
@@ -56,29 +86,65 @@ class DoctorSchedule(db.Model):
         return not (self.end_time <= other_schedule.start_time or 
                    self.start_time >= other_schedule.end_time)
 
-    def get_available_slots(self, date):
-        """Returns available time slots for the given date"""
-        if date.weekday() != self.day_of_week:
-            return []
+    def get_available_slots(self, date, booked=None):
+        """Returns available time slots for the given date.
 
-        slots = []
-        current_time = datetime.combine(date, self.start_time)
-        end_datetime = datetime.combine(date, self.end_time)
+        ``booked`` is an optional set of already-taken datetimes; when it
+        is omitted the day's bookings are fetched in a single range query.
+        """
+        from services.availability import expand_schedule, get_booked_slots
 
-        while current_time + timedelta(minutes=self.slot_duration) <= end_datetime:
-            # Check if the slot is already booked
-            existing_appointment = Appointment.query.filter_by(
-                doctor_id=self.doctor_id,
-                datetime=current_time,
-                status='confirmed'
-            ).first()
+        slots = expand_schedule(self, date)
+        if not slots:
+            return []
 
-            if not existing_appointment:
-                slots.append(current_time)
+        if booked is None:
+            day_start = datetime.combine(date, datetime.min.time())
+            booked = get_booked_slots(self.doctor_id, day_start, day_start + timedelta(days=1))
 
-            current_time += timedelta(minutes=self.slot_duration)
+        return [slot for slot in slots if slot not in booked]
 
-        return slots
+class AvailabilitySlot(db.Model):
+    """Materialized free slots for one doctor on one day"""
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    free_minutes = db.Column(db.Text, nullable=False, default='')  # comma separated minutes since midnight
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.utcnow(), onupdate=lambda: datetime.utcnow())
+
+    __table_args__ = (db.UniqueConstraint('doctor_id', 'date'),)
+
+    def get_slots(self):
+        """Decode the stored minute offsets into datetimes"""
+        day_start = datetime.combine(self.date, datetime.min.time())
+        return [day_start + timedelta(minutes=int(minute))
+                for minute in self.free_minutes.split(',') if minute]
+
+    def set_slots(self, slots):
+        self.free_minutes = ','.join(str(slot.hour * 60 + slot.minute) for slot in slots)
+
+class ChatSession(db.Model):
+    """Server-side chatbot flow state, see services.chat_state"""
+    id = db.Column(db.String(32), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class DoctorVersion(db.Model):
+    """Bumped whenever a doctor's appointments or schedule change, see services.doctor_versions"""
+    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class CacheVersion(db.Model):
+    """Shared invalidation counter for a per-worker cache, e.g. services.doctor_directory"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ReminderCursor(db.Model):
+    """How far the reminder scheduler has scanned, one row per reminder kind"""
+    kind = db.Column(db.String(20), primary_key=True)
+    last_datetime = db.Column(db.DateTime, nullable=False)
+    last_appointment_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.utcnow(), onupdate=lambda: datetime.utcnow())
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -88,4 +154,17 @@ class Notification(db.Model):
     read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.utcnow())
 
-    user = db.relationship('User', backref='notifications')
\ No newline at end of file
+    # Email outbox, see services.notifications; NULL means in-app only
+    delivery_status = db.Column(db.String(20))  # pending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    user = db.relationship('User', backref='notifications')
+
+    __table_args__ = (
+        db.Index('ix_notification_delivery_due', 'next_attempt_at',
+                 postgresql_where=db.text("delivery_status = 'pending'"),
+                 sqlite_where=db.text("delivery_status = 'pending'")),
+    )
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""Route-level benchmark against a seeded database.
+
+Times the hot pages for the busiest doctor and patient (see perf.seed),
+records median/p95 latency and SQL statement counts, and compares them
+with a saved baseline. Exits non-zero when a route gets slower than the
+tolerance allows or issues more statements than before.
+
+    flask seed-data --doctors 500 --patients 20000 --appointments 500000
+    python -m perf.bench_routes --save          # record perf/baseline.json
+    python -m perf.bench_routes                 # compare against it
+
+p95 is the nearest-rank percentile from perf.timing. Baselines saved
+before it replaced the interpolating index report different p95 figures;
+re-save them with ``--save``. Only p50 and statement counts are gated.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import time as time_of_day
+from sqlalchemy import func, select
+from app import create_app, db
+from perf.query_counter import QueryCounter
+from perf.timing import percentile
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def pick_users():
+    """The admin, the doctor with most appointments and the patient with most appointments"""
+    from models import Appointment, DoctorSchedule, User
+
+    admin_id = db.session.scalar(select(User.id).where(User.role == 'admin').order_by(User.id).limit(1))
+    doctor_id = db.session.scalar(
+        select(Appointment.doctor_id).group_by(Appointment.doctor_id)
+        .order_by(func.count().desc()).limit(1)
+    )
+    patient_id = db.session.scalar(
+        select(Appointment.patient_id).group_by(Appointment.patient_id)
+        .order_by(func.count().desc()).limit(1)
+    )
+    if not (admin_id and doctor_id and patient_id):
+        raise RuntimeError('Database has no appointments; run `flask seed-data` first')
+
+    # A day the doctor already works, so the temporary schedule below is realistic
+    day_of_week = db.session.scalar(
+        select(DoctorSchedule.day_of_week).where(DoctorSchedule.doctor_id == doctor_id).limit(1)
+    ) or 0
+    return {'admin': admin_id, 'doctor': doctor_id, 'patient': patient_id, 'day_of_week': day_of_week}
+
+def temporary_schedule(doctor_id, day_of_week):
+    """Insert an evening schedule with no appointments for delete_schedule to remove"""
+    from models import DoctorSchedule
+
+    schedule = DoctorSchedule(doctor_id=doctor_id, day_of_week=day_of_week,
+                              start_time=time_of_day(20), end_time=time_of_day(21))
+    db.session.add(schedule)
+    db.session.commit()
+    return schedule.id
+
+def routes(users):
+    """(name, role, url factory, expected status, setup) for every benchmarked route"""
+    return [
+        ('doctor_available_slots', 'patient',
+         lambda _: f"/patient/api/doctor/{users['doctor']}/available_slots", 200, None),
+        ('doctor_dashboard', 'doctor', lambda _: '/doctor/dashboard', 200, None),
+        ('patient_dashboard', 'patient', lambda _: '/patient/dashboard', 200, None),
+        ('admin_dashboard', 'admin', lambda _: '/admin/dashboard', 200, None),
+        ('admin_appointments', 'admin', lambda _: '/admin/appointments', 200, None),
+        ('doctor_delete_schedule', 'doctor',
+         lambda schedule_id: f'/doctor/schedule/{schedule_id}/delete', 302,
+         lambda: temporary_schedule(users['doctor'], users['day_of_week'])),
+    ]
+
+def run(app, repeat=20, warmup=2):
+    """Return ``{name: {'p50_ms', 'p95_ms', 'queries'}}`` for every route"""
+    with app.app_context():
+        users = pick_users()
+        engine = db.engine
+
+    client = app.test_client()
+    results = {}
+    for name, role, url_for_run, expected, setup in routes(users):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(users[role])
+            session['_fresh'] = True
+
+        timings = []
+        queries = []
+        for i in range(warmup + repeat):
+            argument = None
+            if setup is not None:
+                with app.app_context():
+                    argument = setup()
+
+            # Requests run outside any app context so each gets a fresh `g`
+            with QueryCounter(engine) as counter:
+                started = time.perf_counter()
+                response = client.get(url_for_run(argument))
+                elapsed = time.perf_counter() - started
+            if response.status_code != expected:
+                raise RuntimeError(f'{name} returned {response.status_code}')
+
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(counter.count)
+
+        results[name] = {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'queries': max(queries),
+        }
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print a report and return the names of routes that regressed"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"new   {name}: p50 {current['p50_ms']}ms p95 {current['p95_ms']}ms "
+                  f"{current['queries']} statements")
+            continue
+
+        slower = current['p50_ms'] > previous['p50_ms'] * (1 + tolerance)
+        more_queries = current['queries'] > previous['queries']
+        if slower or more_queries:
+            regressions.append(name)
+        print(f"{'FAIL' if slower or more_queries else 'ok  '}  {name}: "
+              f"p50 {current['p50_ms']}ms (was {previous['p50_ms']}ms), "
+              f"p95 {current['p95_ms']}ms (was {previous['p95_ms']}ms), "
+              f"{current['queries']} statements (was {previous['queries']})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='Timed requests per route')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p50 slowdown as a fraction of the baseline')
+    args = parser.parse_args(argv)
+
+    # Uses DATABASE_URL like the app; STATS_CACHE_TTL=0 so the admin
+    # dashboard measures the real aggregate query rather than a cache hit
+    app = create_app({'STATS_CACHE_TTL': 0, 'TESTING': True})
+    results = run(app, repeat=args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Concurrent booking benchmark.
+
+Many threads race to book the same small set of slots for one doctor.
+Reports successful bookings per second, conflict latency percentiles and
+verifies that no slot ended up with more than one active appointment.
+
+    python -m perf.booking_benchmark --threads 16 --attempts 50
+    DATABASE_URL=postgresql://... python -m perf.booking_benchmark --use-database-url
+
+Without ``--use-database-url`` it runs against a throwaway SQLite file.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as dt_time, timedelta
+from app import create_app, db
+from perf.timing import percentile
+
+
+def setup_data(slots):
+    from models import DoctorSchedule, User
+
+    doctor = User(email='bench-doctor@example.invalid', password_hash='!',
+                  first_name='Bench', last_name='Doctor', role='doctor')
+    db.session.add(doctor)
+    patients = [User(email=f'bench-patient-{i}@example.invalid', password_hash='!',
+                     first_name='Bench', last_name=str(i), role='patient') for i in range(64)]
+    db.session.add_all(patients)
+    db.session.flush()
+
+    day = datetime.utcnow().date() + timedelta(days=1)
+    db.session.add(DoctorSchedule(doctor_id=doctor.id, day_of_week=day.weekday(),
+                                  start_time=dt_time(8), end_time=dt_time(20), slot_duration=15))
+    db.session.commit()
+
+    first_slot = datetime.combine(day, dt_time(8))
+    return doctor.id, [patient.id for patient in patients], [
+        first_slot + timedelta(minutes=15 * i) for i in range(slots)
+    ]
+
+def cleanup_data(doctor_id, patient_ids):
+    from models import Appointment, AvailabilitySlot, DoctorSchedule, Notification, User
+
+    Notification.query.filter(Notification.user_id.in_([doctor_id, *patient_ids])).delete(synchronize_session=False)
+    Appointment.query.filter_by(doctor_id=doctor_id).delete()
+    AvailabilitySlot.query.filter_by(doctor_id=doctor_id).delete()
+    DoctorSchedule.query.filter_by(doctor_id=doctor_id).delete()
+    User.query.filter(User.id.in_([doctor_id, *patient_ids])).delete(synchronize_session=False)
+    db.session.commit()
+
+def run(app, threads, attempts, slots):
+    from models import Appointment
+    from services.booking import SlotTakenError, book_appointment
+
+    with app.app_context():
+        doctor_id, patient_ids, slot_times = setup_data(slots)
+
+    successes = []
+    conflicts = []
+    errors = []
+    error_types = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        barrier.wait()
+        for attempt in range(attempts):
+            slot = slot_times[(index + attempt) % len(slot_times)]
+            patient_id = patient_ids[(index * attempts + attempt) % len(patient_ids)]
+            with app.app_context():
+                start = time.perf_counter()
+                try:
+                    book_appointment(doctor_id, patient_id, slot)
+                    outcome = successes
+                except SlotTakenError:
+                    outcome = conflicts
+                except Exception as e:
+                    db.session.rollback()
+                    outcome = errors
+                    with lock:
+                        error_types[type(e).__name__] += 1
+                elapsed = time.perf_counter() - start
+            with lock:
+                outcome.append(elapsed)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    with app.app_context():
+        active = Appointment.query.filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.status != 'cancelled'
+        ).with_entities(Appointment.datetime).all()
+        cleanup_data(doctor_id, patient_ids)
+
+    double_booked = len(active) - len({row.datetime for row in active})
+    total = threads * attempts
+    print(f'{threads} threads x {attempts} attempts over {slots} slots in {wall:.2f}s '
+          f'({total / wall:.0f} attempts/s)')
+    print(f'  successful bookings: {len(successes)} ({len(successes) / wall:.1f}/s)')
+    for name, values in (('success', successes), ('conflict', conflicts)):
+        if values:
+            print(f'  {name} latency ms: p50={percentile(values, 0.5) * 1000:.2f} '
+                  f'p95={percentile(values, 0.95) * 1000:.2f} '
+                  f'p99={percentile(values, 0.99) * 1000:.2f} '
+                  f'mean={statistics.mean(values) * 1000:.2f}')
+    print(f'  conflicts: {len(conflicts)}  errors: {len(errors)}  double-booked slots: {double_booked}')
+    for name, count in error_types.most_common():
+        print(f'    {name}: {count}')
+    return 1 if double_booked or len(successes) > slots else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=50, help='Booking attempts per thread')
+    parser.add_argument('--slots', type=int, default=32, help='Distinct slots being contended')
+    parser.add_argument('--use-database-url', action='store_true',
+                        help='Run against DATABASE_URL instead of a temporary SQLite file')
+    args = parser.parse_args(argv)
+
+    if args.use_database_url:
+        app = create_app()
+        path = None
+    else:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+        })
+
+    try:
+        with app.app_context():
+            from migrations.runner import upgrade
+            upgrade()
+        return run(app, args.threads, args.attempts, args.slots)
+    finally:
+        if path:
+            os.unlink(path)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Load driver for the chat endpoints.
+
+Replays scripted multi-turn conversations from concurrent virtual users
+against a running app and reports throughput and p50/p95/p99 latency per
+endpoint. Pair it with perf/fake_openai.py to measure capacity offline:
+
+    python -m perf.fake_openai --port 8099 &
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake \\
+        gunicorn --bind 127.0.0.1:5000 --threads 8 main:app &
+    python -m perf.chat_load --target http://127.0.0.1:5000 --users 20 --iterations 5
+
+A script is a JSON list of conversations; each conversation is a list of
+turns. A turn is either a message string or ``{"voice": true}``. ``{user}``
+in a message is replaced with a unique id per virtual user and iteration,
+so a script can register an account and then log in with it. Conversations
+starting with ``login`` are counted, and the run fails if any of them did
+not end up logged in.
+"""
+import argparse
+import http.cookiejar
+import io
+import json
+import statistics
+import struct
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+from collections import defaultdict
+from perf.timing import percentile
+
+DEFAULT_SCRIPT = [
+    ['help', 'hello there', 'help'],
+    ['register', 'load-{user}@example.invalid', 'Load', 'Tester', '1', 'load-password'],
+    ['login', 'load-{user}@example.invalid', 'load-password'],
+    ['book', {'voice': True}],
+]
+
+
+def silent_wav(seconds=1, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(struct.pack('<h', 0) * rate * seconds)
+    return buffer.getvalue()
+
+def multipart_body(field, filename, data, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: {content_type}\r\n\r\n'
+    ).encode('utf-8') + data + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.logins = {'attempted': 0, 'succeeded': 0}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, elapsed, ok):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def record_login(self, succeeded):
+        with self.lock:
+            self.logins['attempted'] += 1
+            self.logins['succeeded'] += int(succeeded)
+
+def virtual_user(target, script, iterations, index, recorder, audio, fetch_audio):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(endpoint, request):
+        start = time.perf_counter()
+        ok = True
+        payload = None
+        try:
+            with opener.open(request, timeout=60) as response:
+                raw = response.read()
+                if response.headers.get_content_type() == 'application/json':
+                    payload = json.loads(raw)
+        except (urllib.error.URLError, TimeoutError, ValueError):
+            ok = False
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+        return payload
+
+    for iteration in range(iterations):
+        # One identity per iteration, shared by its register, login and booking conversations
+        user_id = f'{index}-{iteration}-{uuid.uuid4().hex[:6]}'
+        for conversation in script:
+            logged_in = False
+            for turn in conversation:
+                if isinstance(turn, dict) and turn.get('voice'):
+                    body, content_type = multipart_body('audio', 'voice.wav', audio, 'audio/wav')
+                    endpoint = '/api/chat/voice'
+                    request = urllib.request.Request(target + endpoint, data=body,
+                                                     headers={'Content-Type': content_type})
+                else:
+                    endpoint = '/api/chat/message'
+                    message = turn.replace('{user}', user_id)
+                    request = urllib.request.Request(
+                        target + endpoint,
+                        data=json.dumps({'message': message}).encode('utf-8'),
+                        headers={'Content-Type': 'application/json'}
+                    )
+
+                reply = call(endpoint, request)
+                logged_in = logged_in or bool(reply and reply.get('login_success'))
+                if fetch_audio and reply and reply.get('audio_url'):
+                    call('/api/chat/audio', urllib.request.Request(target + reply['audio_url']))
+            if conversation and conversation[0] == 'login':
+                recorder.record_login(logged_in)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Chat endpoint load driver')
+    parser.add_argument('--target', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=3, help='Script replays per user')
+    parser.add_argument('--script', help='JSON file with conversations (defaults to a built-in mix)')
+    parser.add_argument('--no-audio', action='store_true', help='Do not fetch the audio for each reply')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args(argv)
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script) as script_file:
+            script = json.load(script_file)
+
+    recorder = Recorder()
+    audio = silent_wav()
+    threads = [
+        threading.Thread(target=virtual_user, args=(
+            args.target.rstrip('/'), script, args.iterations, i, recorder, audio, not args.no_audio
+        ))
+        for i in range(args.users)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    report = {}
+    print(f'{args.users} users x {args.iterations} iterations in {wall:.2f}s')
+    for endpoint, values in sorted(recorder.latencies.items()):
+        report[endpoint] = {
+            'requests': len(values),
+            'errors': recorder.errors[endpoint],
+            'throughput_rps': len(values) / wall,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'mean_ms': statistics.mean(values) * 1000,
+        }
+        stats = report[endpoint]
+        print(f"  {endpoint:<20} {stats['requests']:>6} req  {stats['errors']:>4} err  "
+              f"{stats['throughput_rps']:>7.1f} req/s  p50={stats['p50_ms']:.0f}ms  "
+              f"p95={stats['p95_ms']:.0f}ms  p99={stats['p99_ms']:.0f}ms")
+
+    logins = recorder.logins
+    print(f"  logins: {logins['succeeded']}/{logins['attempted']} succeeded")
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump({'wall_seconds': wall, 'endpoints': report, 'logins': logins}, report_file, indent=2)
+
+    return 1 if any(recorder.errors.values()) or logins['succeeded'] < logins['attempted'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
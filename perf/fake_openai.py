@@ -0,0 +1,109 @@
+"""Local stand-in for the OpenAI endpoints used by routes/chat.py.
+
+Serves chat completions, audio transcriptions and audio speech with a
+configurable latency and jitter so the chat endpoints can be load-tested
+offline. Point the app at it with ``OPENAI_BASE_URL``:
+
+    python -m perf.fake_openai --port 8099 --latency-ms 400 --jitter-ms 150
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake python main.py
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = {'chat': 0.4, 'transcription': 0.6, 'speech': 0.8}
+    jitter = 0.1
+    rng = random.Random()
+
+    def log_message(self, format, *args):
+        pass
+
+    def simulate_latency(self, kind):
+        delay = self.latency[kind] + self.rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, delay))
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload, status=200):
+        self.send_body(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def do_POST(self):
+        body = self.read_body()
+        path = self.path.split('?', 1)[0].rstrip('/')
+
+        if path.endswith('/chat/completions'):
+            self.simulate_latency('chat')
+            request = json.loads(body or b'{}')
+            assistant = next((m['content'] for m in request.get('messages', [])
+                              if m.get('role') == 'assistant'), '')
+            self.send_json({
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'gpt-3.5-turbo'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': f'{assistant} (fake)'},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+        elif path.endswith('/audio/transcriptions'):
+            self.simulate_latency('transcription')
+            self.send_json({'text': 'help'})
+        elif path.endswith('/audio/speech'):
+            self.simulate_latency('speech')
+            request = json.loads(body or b'{}')
+            # Roughly the size of real speech: ~1 KB per 10 characters of input
+            size = max(1024, 100 * len(request.get('input', '')))
+            self.send_body(200, b'\xff\xfb' + b'\x00' * (size - 2), 'audio/mpeg')
+        else:
+            self.send_json({'error': {'message': f'Unknown endpoint {self.path}'}}, status=404)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local fake of the OpenAI API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=None,
+                        help='Base latency for every endpoint (overrides the per-endpoint values)')
+    parser.add_argument('--chat-latency-ms', type=float, default=400)
+    parser.add_argument('--transcription-latency-ms', type=float, default=600)
+    parser.add_argument('--speech-latency-ms', type=float, default=800)
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    FakeOpenAIHandler.latency = {
+        'chat': (args.latency_ms if args.latency_ms is not None else args.chat_latency_ms) / 1000,
+        'transcription': (args.latency_ms if args.latency_ms is not None else args.transcription_latency_ms) / 1000,
+        'speech': (args.latency_ms if args.latency_ms is not None else args.speech_latency_ms) / 1000,
+    }
+    FakeOpenAIHandler.jitter = args.jitter_ms / 1000
+    FakeOpenAIHandler.rng = random.Random(args.seed)
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    print(f'Fake OpenAI listening on http://{args.host}:{args.port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
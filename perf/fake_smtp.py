@@ -0,0 +1,118 @@
+"""Local stand-in for an SMTP relay, for exercising the notification outbox.
+
+Accepts plain (no TLS, no auth) SMTP, throws the messages away and counts
+connections and messages so batching can be checked. ``--fail-rate``
+rejects that fraction of messages with a transient 451 to exercise the
+retry path.
+
+    python -m perf.fake_smtp --port 8025 --latency-ms 20
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=8025 MAIL_USE_TLS=0 \\
+        MAIL_DEFAULT_SENDER=clinic@example.invalid flask notifications-worker --once
+"""
+import argparse
+import random
+import socketserver
+import threading
+import time
+
+
+class Stats:
+    lock = threading.Lock()
+    connections = 0
+    messages = 0
+    rejected = 0
+
+    @classmethod
+    def add(cls, name):
+        with cls.lock:
+            setattr(cls, name, getattr(cls, name) + 1)
+
+    @classmethod
+    def summary(cls):
+        return f'connections={cls.connections} messages={cls.messages} rejected={cls.rejected}'
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    verbose = False
+    rng = random.Random()
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+    def read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                return b''.join(lines)
+            lines.append(line)
+
+    def handle(self):
+        Stats.add('connections')
+        self.reply('220 fake-smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.reply('250-fake-smtp')
+                self.reply('250 8BITMIME')
+            elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self.read_data()
+                time.sleep(self.latency)
+                if self.rng.random() < self.fail_rate:
+                    Stats.add('rejected')
+                    self.reply('451 Temporary failure, try again later')
+                else:
+                    Stats.add('messages')
+                    if self.verbose:
+                        subject = next((header for header in data.split(b'\n')
+                                        if header.lower().startswith(b'subject:')), b'')
+                        print(subject.decode('utf-8', 'replace').strip(), '|', Stats.summary())
+                    self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local fake SMTP relay')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay before accepting each message')
+    parser.add_argument('--fail-rate', type=float, default=0, help='Fraction of messages rejected with 451')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help='Print every accepted subject')
+    args = parser.parse_args(argv)
+
+    FakeSMTPHandler.latency = args.latency_ms / 1000
+    FakeSMTPHandler.fail_rate = args.fail_rate
+    FakeSMTPHandler.verbose = args.verbose
+    FakeSMTPHandler.rng = random.Random(args.seed)
+
+    server = FakeSMTPServer((args.host, args.port), FakeSMTPHandler)
+    print(f'Fake SMTP listening on {args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(Stats.summary())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Login throughput benchmark.
+
+Many threads log in through ``/login`` at once, the way a clinic's staff
+and patients do at opening time. Reports logins per second and latency
+percentiles, and while the burst runs, how quickly an unrelated
+lightweight request still gets served.
+
+    python -m perf.login_benchmark --threads 16 --logins 10 --workers 0
+    python -m perf.login_benchmark --threads 16 --logins 10 --workers 8
+
+``--workers`` sets PASSWORD_HASH_WORKERS (0 hashes in the request thread).
+It runs against a throwaway SQLite file.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from app import create_app, db
+from perf.timing import percentile
+
+PASSWORD = 'correct horse battery staple'
+
+
+def setup_users(count):
+    from models import User
+
+    users = [User(email=f'bench-login-{i}@example.invalid', first_name='Bench',
+                  last_name=str(i), role='patient') for i in range(count)]
+    # One hash shared by every user keeps setup fast; verification cost is the same
+    users[0].set_password(PASSWORD)
+    for user in users[1:]:
+        user.password_hash = users[0].password_hash
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.email for user in users]
+
+def run(app, threads, logins):
+    with app.app_context():
+        emails = setup_users(threads)
+
+    latencies = []
+    probes = []
+    failures = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+    done = threading.Event()
+
+    def worker(email):
+        client = app.test_client()
+        barrier.wait()
+        for _ in range(logins):
+            start = time.perf_counter()
+            response = client.post('/login', data={'email': email, 'password': PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 302 and '/login' not in response.location:
+                    latencies.append(elapsed)
+                else:
+                    failures.append(response.status_code)
+            client.get('/logout')
+
+    def prober():
+        # The login page renders without touching passwords or the database
+        client = app.test_client()
+        barrier.wait()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/login')
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    pool = [threading.Thread(target=worker, args=(email,)) for email in emails]
+    probe = threading.Thread(target=prober)
+    for thread in (*pool, probe):
+        thread.start()
+
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - started
+    done.set()
+    probe.join()
+
+    print(f'{threads} threads x {logins} logins in {wall:.2f}s '
+          f'({len(latencies) / wall:.1f} logins/s), workers={app.config["PASSWORD_HASH_WORKERS"]}')
+    for name, values in (('login', latencies), ('unrelated page', probes)):
+        if values:
+            print(f'  {name} latency ms: p50={percentile(values, 0.5) * 1000:.1f} '
+                  f'p95={percentile(values, 0.95) * 1000:.1f} '
+                  f'p99={percentile(values, 0.99) * 1000:.1f} '
+                  f'mean={statistics.mean(values) * 1000:.1f}')
+    print(f'  failed logins: {len(failures)}')
+    return 1 if failures else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=10, help='Logins per thread')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Password hashing processes, 0 for inline hashing')
+    parser.add_argument('--method', default=None, help='werkzeug hash method, e.g. pbkdf2:sha256:600000')
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+        'PASSWORD_HASH_WORKERS': args.workers,
+    }
+    if args.method:
+        config['PASSWORD_HASH_METHOD'] = args.method
+    app = create_app(config)
+
+    try:
+        with app.app_context():
+            from migrations.runner import upgrade
+            upgrade()
+        return run(app, args.threads, args.logins)
+    finally:
+        os.unlink(path)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""N+1 regression guard for the dashboard pages.
+
+Renders each page against an in-memory SQLite database seeded at two
+different sizes and fails if a page's SQL statement count grows with the
+number of rows. Run with ``python -m perf.n_plus_one``.
+"""
+import sys
+from datetime import datetime, time, timedelta
+from app import create_app, db
+from perf.query_counter import QueryCounter
+
+PAGES = [
+    ('doctor', '/doctor/dashboard'),
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/doctors'),
+    ('patient', '/patient/dashboard'),
+    ('patient', '/patient/book_appointment'),
+]
+
+
+def seed(rows):
+    """Seed ``rows`` doctors, patients and appointments per page; return user ids by role"""
+    from models import Appointment, DoctorSchedule, Specialization, User
+
+    def make_user(role, i, specialization=None):
+        user = User(
+            email=f'{role}{i}@example.invalid',
+            password_hash='!',
+            first_name=role.title(),
+            last_name=str(i),
+            role=role,
+            specialization=specialization
+        )
+        db.session.add(user)
+        return user
+
+    admin = make_user('admin', 0)
+    doctors = [make_user('doctor', i, Specialization(name=f'Specialization {i}')) for i in range(rows)]
+    patients = [make_user('patient', i) for i in range(rows)]
+    db.session.flush()
+
+    db.session.add(DoctorSchedule(doctor_id=doctors[0].id, day_of_week=0,
+                                  start_time=time(9), end_time=time(17)))
+
+    now = datetime.utcnow()
+    today = now.replace(hour=23, minute=0, second=0, microsecond=0)
+    for i in range(rows):
+        for when, status in [(today, 'confirmed'), (now + timedelta(days=2, hours=i), 'pending')]:
+            # The first doctor sees every patient; the first patient sees every doctor
+            db.session.add(Appointment(doctor_id=doctors[0].id, patient_id=patients[i].id,
+                                       datetime=when - timedelta(minutes=i + 1), status=status))
+            db.session.add(Appointment(doctor_id=doctors[i].id, patient_id=patients[0].id,
+                                       datetime=when + timedelta(minutes=i), status=status))
+    db.session.commit()
+
+    return {'admin': admin.id, 'doctor': doctors[0].id, 'patient': patients[0].id}
+
+def measure(rows):
+    """Return ``{url: statement_count}`` for every page at the given dataset size"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'STATS_CACHE_TTL': 0,
+        'DOCTOR_DIRECTORY_TTL': 0,
+        'IDENTITY_CACHE_TTL': 0,
+        'TESTING': True,
+    })
+
+    with app.app_context():
+        db.create_all()
+        user_ids = seed(rows)
+        engine = db.engine
+
+    # Requests run outside the seeding app context so each gets a fresh `g`
+    counts = {}
+    client = app.test_client()
+    for role, url in PAGES:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_ids[role])
+            session['_fresh'] = True
+
+        with QueryCounter(engine) as counter:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        counts[url] = counter.count
+
+    return counts
+
+def main(small=3, large=15):
+    small_counts = measure(small)
+    large_counts = measure(large)
+
+    failed = False
+    for _, url in PAGES:
+        grows = large_counts[url] > small_counts[url]
+        failed = failed or grows
+        print(f"{'FAIL' if grows else 'ok  '}  {url}: {small_counts[url]} statements "
+              f"with {small} rows, {large_counts[url]} with {large} rows")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
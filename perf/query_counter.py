@@ -0,0 +1,27 @@
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Count SQL statements executed on an engine while the context is active
+
+        with QueryCounter(db.engine) as counter:
+            client.get('/doctor/dashboard')
+        print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
@@ -0,0 +1,168 @@
+"""Synthetic dataset generator.
+
+Bulk-inserts doctors, patients, specializations, weekly schedules and
+appointments with a Zipf-like skew so a few doctors carry most of the
+bookings, like a real clinic. Every seeded user gets the same password so
+the login paths can be exercised.
+
+    flask seed-data --doctors 5000 --patients 200000 --appointments 2000000
+"""
+import random
+from datetime import datetime, time, timedelta
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+from app import db
+from models import Appointment, DoctorSchedule, Specialization, User
+from services.passwords import configured_method
+
+SPECIALIZATIONS = [
+    'General Practice', 'Cardiology', 'Dermatology', 'Pediatrics', 'Orthopedics',
+    'Neurology', 'Psychiatry', 'Ophthalmology', 'Gynecology', 'ENT',
+    'Oncology', 'Endocrinology', 'Gastroenterology', 'Urology', 'Pulmonology',
+]
+
+BATCH_SIZE = 10000
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 16  # 09:00-17:00
+
+
+def skewed_weights(buckets, skew, rng):
+    """Zipf-like weights 1 / rank**skew in random order"""
+    weights = [1 / (rank ** skew) for rank in range(1, buckets + 1)]
+    rng.shuffle(weights)
+    return weights
+
+def allocate(total, weights, capacities):
+    """Split ``total`` proportionally to ``weights`` without exceeding any capacity"""
+    counts = [0] * len(weights)
+    active = [i for i, capacity in enumerate(capacities) if capacity > 0]
+    remaining = total
+    while remaining > 0 and active:
+        weight_sum = sum(weights[i] for i in active)
+        given = 0
+        for i in active:
+            share = max(1, int(remaining * weights[i] / weight_sum))
+            add = min(share, capacities[i] - counts[i], remaining - given)
+            counts[i] += add
+            given += add
+        active = [i for i in active if counts[i] < capacities[i]]
+        remaining -= given
+        if given == 0:
+            break
+    return counts
+
+def insert_batches(table, rows):
+    batch = []
+    inserted = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            inserted += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        inserted += len(batch)
+    return inserted
+
+def seed(doctors=100, patients=2000, appointments=50000, skew=1.1, past_days=365,
+         future_days=30, password='password', prefix='seed', seed_value=42, echo=print):
+    """Insert a synthetic dataset and return the number of rows per table"""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    password_hash = generate_password_hash(password, configured_method())
+    users = User.__table__
+
+    existing = {row.name: row.id for row in db.session.execute(select(Specialization.id, Specialization.name))}
+    missing = [{'name': name} for name in SPECIALIZATIONS if name not in existing]
+    if missing:
+        db.session.execute(Specialization.__table__.insert(), missing)
+        db.session.commit()
+    specialization_ids = [row.id for row in db.session.execute(select(Specialization.id))]
+
+    def user_rows(role, count):
+        for i in range(count):
+            yield {
+                'email': f'{prefix}-{role}-{i}@example.invalid',
+                'password_hash': password_hash,
+                'first_name': role.title(),
+                'last_name': f'{prefix.title()}{i}',
+                'role': role,
+                'specialization_id': rng.choice(specialization_ids) if role == 'doctor' else None,
+                'created_at': now,
+            }
+
+    def user_ids(role):
+        return [row.id for row in db.session.execute(
+            select(users.c.id).where(users.c.email.like(f'{prefix}-{role}-%')).order_by(users.c.id)
+        )]
+
+    counts = {}
+    counts['admins'] = insert_batches(users, user_rows('admin', 1))
+    counts['doctors'] = insert_batches(users, user_rows('doctor', doctors))
+    counts['patients'] = insert_batches(users, user_rows('patient', patients))
+    echo(f"doctors: {counts['doctors']}, patients: {counts['patients']}")
+    doctor_ids = user_ids('doctor')
+    patient_ids = user_ids('patient')
+
+    working_days = {}
+
+    def schedule_rows():
+        for doctor_id in doctor_ids:
+            days = sorted(rng.sample(range(7), rng.randint(3, 6)))
+            working_days[doctor_id] = days
+            for day in days:
+                yield {
+                    'doctor_id': doctor_id,
+                    'day_of_week': day,
+                    'start_time': time(9),
+                    'end_time': time(17),
+                    'slot_duration': SLOT_MINUTES,
+                }
+
+    counts['schedules'] = insert_batches(DoctorSchedule.__table__, schedule_rows())
+    echo(f"schedules: {counts['schedules']}")
+
+    first_day = (now - timedelta(days=past_days)).date()
+    total_days = past_days + future_days
+    patient_cumulative = []
+    running = 0.0
+    for weight in skewed_weights(len(patient_ids), skew, rng):
+        running += weight
+        patient_cumulative.append(running)
+
+    all_days = [first_day + timedelta(days=offset) for offset in range(total_days)]
+    doctor_days = {
+        doctor_id: [day for day in all_days if day.weekday() in working_days[doctor_id]]
+        for doctor_id in doctor_ids
+    }
+    per_doctor = allocate(
+        appointments,
+        skewed_weights(len(doctor_ids), skew, rng),
+        [len(doctor_days[doctor_id]) * SLOTS_PER_DAY for doctor_id in doctor_ids]
+    )
+
+    def appointment_rows():
+        for doctor_id, count in zip(doctor_ids, per_doctor):
+            days = doctor_days[doctor_id]
+            # Distinct slots per doctor keep the unique active-slot index happy
+            for index in rng.sample(range(len(days) * SLOTS_PER_DAY), count):
+                day, slot = divmod(index, SLOTS_PER_DAY)
+                when = datetime.combine(days[day], time(9)) + timedelta(minutes=SLOT_MINUTES * slot)
+                if when < now:
+                    status = rng.choices(['confirmed', 'cancelled'], weights=[85, 15])[0]
+                else:
+                    status = rng.choices(['pending', 'confirmed', 'cancelled'], weights=[30, 60, 10])[0]
+                yield {
+                    'doctor_id': doctor_id,
+                    'patient_id': rng.choices(patient_ids, cum_weights=patient_cumulative)[0],
+                    'datetime': when,
+                    'status': status,
+                    'created_at': min(when, now) - timedelta(days=rng.randint(0, 14)),
+                }
+
+    counts['appointments'] = insert_batches(Appointment.__table__, appointment_rows())
+    echo(f"appointments: {counts['appointments']}")
+    return counts
@@ -0,0 +1,14 @@
+"""Latency summaries shared by the benchmarks and load drivers."""
+import math
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile: the smallest value with at least ``fraction`` of samples at or below it.
+
+    Returns 0.0 when there are no values.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = math.ceil(fraction * len(values))
+    return values[min(len(values) - 1, max(0, rank - 1))]
@@ -1,8 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from app import db
 from models import User, Appointment, Specialization
 from functools import wraps
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import joinedload, aliased
+from datetime import datetime, timedelta
+from metrics import render_metrics
+from services.stats import get_dashboard_stats
+from services import doctor_directory
+from services.passwords import PasswordHashBusy
+import csv
+import hmac
+import io
+import json
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -19,22 +30,24 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    total_doctors = User.query.filter_by(role='doctor').count()
-    total_patients = User.query.filter_by(role='patient').count()
-    total_appointments = Appointment.query.count()
-    recent_appointments = Appointment.query.order_by(Appointment.created_at.desc()).limit(5).all()
+    stats = get_dashboard_stats(db.session)
+    recent_appointments = Appointment.query.options(
+        joinedload(Appointment.doctor),
+        joinedload(Appointment.patient)
+    ).order_by(Appointment.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html',
-                         total_doctors=total_doctors,
-                         total_patients=total_patients,
-                         total_appointments=total_appointments,
+                         total_doctors=stats['total_doctors'],
+                         total_patients=stats['total_patients'],
+                         total_appointments=stats['total_appointments'],
+                         appointments_by_status=stats['appointments_by_status'],
                          recent_appointments=recent_appointments)
 
 @admin_bp.route('/doctors')
 @login_required
 @admin_required
 def manage_doctors():
-    doctors = User.query.filter_by(role='doctor').all()
+    doctors = doctor_directory.get_doctors(db.session)
     specializations = Specialization.query.all()
     return render_template('admin/doctors.html',
                          doctors=doctors,
@@ -61,17 +74,155 @@ def add_doctor():
         role='doctor',
         specialization_id=specialization_id
     )
-    doctor.set_password(password)
+    try:
+        doctor.set_password(password)
+    except PasswordHashBusy:
+        flash('The server is busy, please try adding the doctor again in a moment.')
+        return redirect(url_for('admin.manage_doctors'))
     
     db.session.add(doctor)
     db.session.commit()
+    doctor_directory.bump()
     
     flash('Doctor added successfully')
     return redirect(url_for('admin.manage_doctors'))
 
+APPOINTMENTS_PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 1000
+
+def appointment_filters(args):
+    """Build filter clauses from the doctor/patient/status/date query arguments"""
+    filters = []
+    if args.get('doctor_id', type=int):
+        filters.append(Appointment.doctor_id == args.get('doctor_id', type=int))
+    if args.get('patient_id', type=int):
+        filters.append(Appointment.patient_id == args.get('patient_id', type=int))
+    if args.get('status'):
+        filters.append(Appointment.status == args.get('status'))
+    if args.get('date_from'):
+        filters.append(Appointment.datetime >= datetime.strptime(args['date_from'], '%Y-%m-%d'))
+    if args.get('date_to'):
+        date_to = datetime.strptime(args['date_to'], '%Y-%m-%d') + timedelta(days=1)
+        filters.append(Appointment.datetime < date_to)
+    return filters
+
+def encode_cursor(appointment):
+    # Full precision, microseconds included, or rows at a page boundary are skipped
+    return f"{appointment.datetime.isoformat()}_{appointment.id}"
+
+def decode_cursor(cursor):
+    value, appointment_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(value), int(appointment_id)
+
 @admin_bp.route('/appointments')
 @login_required
 @admin_required
 def view_appointments():
-    appointments = Appointment.query.all()
-    return render_template('admin/appointments.html', appointments=appointments)
+    """Newest-first appointment list with keyset pagination on (datetime, id)"""
+    try:
+        filters = appointment_filters(request.args)
+        cursor = request.args.get('after')
+        if cursor:
+            filters.append(tuple_(Appointment.datetime, Appointment.id) < decode_cursor(cursor))
+    except ValueError:
+        flash('Invalid filter or page cursor', 'error')
+        return redirect(url_for('admin.view_appointments'))
+
+    # Fetch one extra row to know whether there is a next page without a COUNT(*)
+    rows = Appointment.query.options(
+        joinedload(Appointment.doctor),
+        joinedload(Appointment.patient)
+    ).filter(*filters).order_by(
+        Appointment.datetime.desc(), Appointment.id.desc()
+    ).limit(APPOINTMENTS_PAGE_SIZE + 1).all()
+
+    appointments = rows[:APPOINTMENTS_PAGE_SIZE]
+    next_cursor = encode_cursor(appointments[-1]) if len(rows) > APPOINTMENTS_PAGE_SIZE else None
+    filter_args = {key: value for key, value in request.args.items() if key != 'after' and value}
+
+    return render_template('admin/appointments.html',
+                         appointments=appointments,
+                         next_cursor=next_cursor,
+                         filter_args=filter_args)
+
+@admin_bp.route('/appointments/export')
+@login_required
+@admin_required
+def export_appointments():
+    """Stream filtered appointments as CSV or NDJSON from a server-side cursor"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        abort(400)
+
+    try:
+        filters = appointment_filters(request.args)
+    except ValueError:
+        abort(400)
+
+    doctor = aliased(User)
+    patient = aliased(User)
+    statement = select(
+        Appointment.id,
+        Appointment.datetime,
+        Appointment.status,
+        Appointment.doctor_id,
+        (doctor.first_name + ' ' + doctor.last_name).label('doctor_name'),
+        Appointment.patient_id,
+        (patient.first_name + ' ' + patient.last_name).label('patient_name'),
+        Appointment.notes,
+        Appointment.created_at
+    ).join(doctor, Appointment.doctor_id == doctor.id).join(
+        patient, Appointment.patient_id == patient.id
+    ).where(*filters).order_by(Appointment.datetime, Appointment.id)
+
+    columns = ['id', 'datetime', 'status', 'doctor_id', 'doctor_name',
+               'patient_id', 'patient_name', 'notes', 'created_at']
+
+    def serialize(row):
+        values = row._asdict()
+        for key in ('datetime', 'created_at'):
+            if values[key] is not None:
+                values[key] = values[key].isoformat()
+        return values
+
+    def generate():
+        result = db.session.execute(
+            statement,
+            execution_options={'stream_results': True, 'yield_per': EXPORT_BATCH_SIZE}
+        )
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        if export_format == 'csv':
+            writer.writeheader()
+
+        for partition in result.partitions():
+            for row in partition:
+                if export_format == 'csv':
+                    writer.writerow(serialize(row))
+                else:
+                    buffer.write(json.dumps(serialize(row)) + '\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+        result.close()
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    filename = f"appointments.{export_format}"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@admin_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; admins or a METRICS_TOKEN bearer only"""
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    is_admin = current_user.is_authenticated and current_user.role == 'admin'
+
+    if not (has_token or is_admin):
+        abort(403)
+
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from models import User, Specialization
+from services import doctor_directory
+from services.passwords import PasswordHashBusy
 from sqlalchemy.exc import IntegrityError
 import os
 
@@ -27,7 +29,14 @@ def login():
         password = request.form.get('password')
         user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordHashBusy:
+            flash('The server is busy, please try logging in again in a moment.')
+            return render_template('auth/login.html'), 503
+
+        if valid:
+            db.session.commit()  # keeps a re-hashed password
             login_user(user)
             if user.role == 'admin':
                 return redirect(url_for('admin.dashboard'))
@@ -77,6 +86,8 @@ def register():
 
             db.session.add(user)
             db.session.commit()
+            if role == 'doctor':
+                doctor_directory.bump()
 
             flash('Registration successful! Please login.')
             return redirect(url_for('auth.login'))
@@ -84,6 +95,11 @@ def register():
             db.session.rollback()
             flash('Email address is already registered. Please use a different email.')
             return redirect(url_for('auth.register'))
+        except PasswordHashBusy:
+            db.session.rollback()
+            flash('The server is busy, please try registering again in a moment.')
+            return render_template('auth/register.html',
+                                   specializations=Specialization.query.all()), 503
         except Exception as e:
             db.session.rollback()
             flash('An error occurred during registration. Please try again.')
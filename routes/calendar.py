@@ -0,0 +1,40 @@
+from flask import Blueprint, Response, abort, current_app, flash, redirect, request, stream_with_context, url_for
+from flask_login import current_user, login_required
+from app import db
+from services.ics_feed import feed_etag, feed_window, generate_feed, read_token, reset_token
+
+calendar_bp = Blueprint('calendar', __name__)
+
+@calendar_bp.route('/calendar/<token>.ics')
+def ics_feed(token):
+    """iCalendar subscription feed; the signed token stands in for a login"""
+    user = read_token(db.session, token)
+    if user is None or user[1] not in ('doctor', 'patient'):
+        abort(404)
+    user_id, role = user
+
+    start, end = feed_window()
+    etag = feed_etag(db.session, role, user_id, start, end)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(
+            stream_with_context(generate_feed(db.session, role, user_id, request.host, start, end)),
+            mimetype='text/calendar'
+        )
+        response.headers['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config.get('CALENDAR_FEED_MAX_AGE', 300)
+    return response
+
+@calendar_bp.route('/calendar/reset', methods=['POST'])
+@login_required
+def reset_feed():
+    """Replace the user's subscription link; the old one stops working"""
+    if current_user.role not in ('doctor', 'patient'):
+        abort(404)
+    reset_token(db.session, current_user.id)
+    db.session.commit()
+    flash('Your calendar link has been reset. Subscribe again with the new link.')
+    return redirect(url_for(f'{current_user.role}.dashboard'))
@@ -1,20 +1,110 @@
-python
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, current_app, url_for, Response
 from flask_login import current_user
 from chatbot.handler import ChatbotHandler
-import soundfile as sf
-import numpy as np
+from chatbot.policy import ResponseCache, normalize_prompt, should_polish, strip_policy
+from services.audio_cache import AudioCache, audio_key
+from services.chat_state import save_state
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import os
-from datetime import datetime
+import time
+import threading
 from openai import OpenAI
-import base64
-import tempfile
 
 chat_bp = Blueprint('chat', __name__)
+chat_bp.after_request(save_state)
 chatbot = ChatbotHandler()
+response_cache = ResponseCache()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+TTS_MODEL = 'tts-1'
+TTS_VOICE = 'alloy'
+TTS_FORMAT = 'mp3'
+TTS_MIMETYPE = 'audio/mpeg'
+
+# Upstream OpenAI calls run on a bounded pool so a slow round trip never
+# holds more than its own request, and speech is generated in the
+# background while the text reply is already on its way to the client.
+# Speech has a pool of its own so a TTS backlog cannot starve the
+# interactive GPT and Whisper calls.
+_executors = {}
+_executor_lock = threading.Lock()
+_client = None
+_audio_cache = None
+
+# audio_id -> (future, submitted_at); entries are dropped once fetched or expired
+_pending_audio = {}
+_pending_lock = threading.Lock()
+PENDING_AUDIO_TTL = 300
+AUDIO_POLL_INTERVAL = 0.1  # seconds between checks for audio another worker is generating
+
+
+def get_client():
+    """Create the OpenAI client on first use rather than at import time"""
+    global _client
+    if _client is None:
+        _client = OpenAI(
+            api_key=os.environ.get('OPENAI_API_KEY'),
+            base_url=current_app.config.get('OPENAI_BASE_URL'),
+            timeout=current_app.config.get('CHAT_UPSTREAM_TIMEOUT', 10),
+            max_retries=0
+        )
+    return _client
+
+def get_audio_cache():
+    global _audio_cache
+    if _audio_cache is None:
+        _audio_cache = AudioCache(
+            current_app.config['TTS_CACHE_DIR'],
+            memory_bytes=current_app.config.get('TTS_CACHE_MEMORY_MB', 16) * 1024 * 1024,
+            disk_bytes=current_app.config.get('TTS_CACHE_DISK_MB', 512) * 1024 * 1024
+        )
+    return _audio_cache
+
+def get_executor(kind='upstream'):
+    """The ``upstream`` (GPT, Whisper) or ``tts`` pool, created on first use"""
+    with _executor_lock:
+        if kind not in _executors:
+            setting = 'CHAT_TTS_WORKERS' if kind == 'tts' else 'CHAT_UPSTREAM_WORKERS'
+            _executors[kind] = ThreadPoolExecutor(
+                max_workers=current_app.config.get(setting, 8),
+                thread_name_prefix=f'chat-{kind}'
+            )
+    return _executors[kind]
+
+def run_upstream(fn, *args, timeout=None):
+    """Run an upstream call on the pool and wait at most ``timeout`` seconds.
+
+    On timeout a call still queued is dropped; one already running ends at
+    the client's own CHAT_UPSTREAM_TIMEOUT.
+    """
+    timeout = timeout or current_app.config.get('CHAT_UPSTREAM_TIMEOUT', 10)
+    future = get_executor().submit(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+def chat_user():
+    """The handler expects None rather than Flask-Login's anonymous user"""
+    return current_user if current_user.is_authenticated else None
+
+def schedule_speech(text):
+    """Start generating speech in the background and return its audio URL"""
+    audio_id = audio_key(TTS_MODEL, TTS_VOICE, text)
+    cache = get_audio_cache()
+    if cache.get(audio_id) is not None:
+        return url_for('chat.get_audio', audio_id=audio_id)
+
+    now = time.monotonic()
+    with _pending_lock:
+        for key, (_, submitted_at) in list(_pending_audio.items()):
+            if now - submitted_at > PENDING_AUDIO_TTL:
+                del _pending_audio[key]
+        if audio_id not in _pending_audio:
+            cache.mark_pending(audio_id)
+            _pending_audio[audio_id] = (get_executor('tts').submit(generate_speech, text, get_client(), cache), now)
+
+    return url_for('chat.get_audio', audio_id=audio_id)
 
 @chat_bp.route('/api/chat/message', methods=['POST'])
 def handle_message():
@@ -27,19 +117,17 @@ def handle_message():
 
     try:
         # Get chatbot response
-        chatbot_response = chatbot.process_message(message, current_user)
+        chatbot_response = chatbot.process_message(message, chat_user())
 
-        # Get GPT response for enhanced conversation
-        gpt_response = get_gpt_response(message, chatbot_response['message'])
+        # Get GPT response for enhanced conversation where the policy allows it
+        gpt_response = get_gpt_response(message, chatbot_response['message'],
+                                         polish=should_polish(chatbot_response))
 
-        # Generate audio response
-        audio_response = generate_speech(gpt_response)
-
-        # Combine responses
+        # Reply with the text now; the client fetches the audio when it is ready
         response = {
-            **chatbot_response,
+            **strip_policy(chatbot_response),
             'message': gpt_response,
-            'audio_response': audio_response
+            'audio_url': schedule_speech(gpt_response)
         }
 
         return jsonify(response)
@@ -56,89 +144,164 @@ def handle_voice():
     audio_file = request.files['audio']
 
     try:
-        # Save the uploaded audio file temporarily
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            audio_file.save(temp_file.name)
-
-            # Transcribe audio using OpenAI Whisper
-            with open(temp_file.name, 'rb') as audio:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio,
-                )
-
-            # Clean up temporary file
-            os.unlink(temp_file.name)
-
-            # Get chatbot and GPT responses
-            chatbot_response = chatbot.process_message(transcript.text, current_user)
-            gpt_response = get_gpt_response(transcript.text, chatbot_response['message'])
+        # Hand the upload to Whisper straight from memory
+        upload = (
+            audio_file.filename or 'voice.wav',
+            audio_file.read(),
+            audio_file.mimetype or 'audio/wav'
+        )
+        transcript_text = run_upstream(transcribe_audio, upload, get_client())
 
-            # Generate audio response
-            audio_response = generate_speech(gpt_response)
+        # Get chatbot and GPT responses
+        chatbot_response = chatbot.process_message(transcript_text, chat_user())
+        gpt_response = get_gpt_response(transcript_text, chatbot_response['message'],
+                                        polish=should_polish(chatbot_response))
 
-            # Combine responses
-            response = {
-                **chatbot_response,
-                'transcription': transcript.text,
-                'message': gpt_response,
-                'audio_response': audio_response
-            }
+        # Combine responses
+        response = {
+            **strip_policy(chatbot_response),
+            'transcription': transcript_text,
+            'message': gpt_response,
+            'audio_url': schedule_speech(gpt_response)
+        }
 
-            return jsonify(response)
+        return jsonify(response)
 
+    except FutureTimeoutError:
+        return jsonify({'error': 'Transcription timed out'}), 504
     except Exception as e:
         print(f"Error processing voice message: {str(e)}")
         return jsonify({'error': 'Failed to process voice message'}), 500
 
-def get_gpt_response(user_message, chatbot_response):
-    """Get enhanced response from GPT-3.5 Turbo"""
-    try:
-        system_prompt = """You are a helpful medical assistant chatbot. Your responses should be:
-        1. Clear and concise
-        2. Professional but friendly
-        3. Focused on medical appointment management
-        4. Informative without being overwhelming
-
-        When responding to medical queries, always remind users to consult with their healthcare provider 
-        for specific medical advice."""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "assistant", "content": chatbot_response},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=150
-        )
+@chat_bp.route('/api/chat/audio/<audio_id>')
+def get_audio(audio_id):
+    """Stream the speech for a reply, waiting for it if it is still being generated.
+
+    Audio scheduled by another worker is found through the shared
+    ``TTS_CACHE_DIR``, so every worker serving these URLs must run on the
+    same host (or behind sticky routing). Supports Range and conditional
+    requests so players can start early and seek.
+    """
+    with _pending_lock:
+        entry = _pending_audio.get(audio_id)
+
+    timeout = current_app.config.get('CHAT_TTS_TIMEOUT', 20)
+    if entry is None:
+        # Finished audio, or audio another worker on this host is still generating
+        cache = get_audio_cache()
+        audio_bytes = cache.get(audio_id)
+        deadline = time.monotonic() + timeout
+        while audio_bytes is None and cache.is_pending(audio_id):
+            if time.monotonic() >= deadline:
+                return jsonify({'error': 'Audio is not ready'}), 504, {'Retry-After': '5'}
+            time.sleep(AUDIO_POLL_INTERVAL)
+            audio_bytes = cache.get(audio_id)
+        if audio_bytes is None:
+            return jsonify({'error': 'Audio not found'}), 404
+    else:
+        try:
+            audio_bytes = entry[0].result(timeout=timeout)
+        except FutureTimeoutError:
+            return jsonify({'error': 'Audio is not ready'}), 504, {'Retry-After': '5'}
+
+        with _pending_lock:
+            _pending_audio.pop(audio_id, None)
+
+        if audio_bytes is None:
+            return jsonify({'error': 'Audio generation failed'}), 502
+
+    response = Response(audio_bytes, mimetype=TTS_MIMETYPE)
+    response.set_etag(audio_id)
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(audio_bytes))
+
+def transcribe_audio(upload, client):
+    """Transcribe a ``(filename, bytes, content_type)`` upload using OpenAI Whisper"""
+    transcript = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=upload,
+    )
+    return transcript.text
+
+def get_gpt_response(user_message, chatbot_response, polish=True):
+    """Get enhanced response from GPT-3.5 Turbo.
+
+    Returns the chatbot text unchanged when ``polish`` is false, and falls
+    back to it on error or timeout. Successful rewrites are cached.
+    """
+    if not polish:
+        return chatbot_response
 
-        return response.choices[0].message.content.strip()
+    key = normalize_prompt(user_message, chatbot_response)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
 
+    try:
+        gpt_response = run_upstream(request_gpt_response, user_message, chatbot_response, get_client())
     except Exception as e:
         print(f"Error getting GPT response: {str(e)}")
         return chatbot_response
 
-def generate_speech(text):
-    """Generate speech from text using TTS"""
-    try:
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",
-            input=text
-        )
+    response_cache.set(key, gpt_response, current_app.config.get('CHAT_LLM_CACHE_TTL', 600))
+    return gpt_response
+
+def request_gpt_response(user_message, chatbot_response, client):
+    system_prompt = """You are a helpful medical assistant chatbot. Your responses should be:
+    1. Clear and concise
+    2. Professional but friendly
+    3. Focused on medical appointment management
+    4. Informative without being overwhelming
 
-        # Save the audio temporarily and read it as base64
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            response.stream_to_file(temp_file.name)
+    When responding to medical queries, always remind users to consult with their healthcare provider
+    for specific medical advice."""
 
-            with open(temp_file.name, 'rb') as audio_file:
-                audio_data = base64.b64encode(audio_file.read()).decode('utf-8')
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "assistant", "content": chatbot_response},
+            {"role": "user", "content": user_message}
+        ],
+        temperature=0.7,
+        max_tokens=150
+    )
 
-            os.unlink(temp_file.name)
-            return audio_data
+    return response.choices[0].message.content.strip()
 
+def generate_speech(text, client, cache=None):
+    """Generate speech from text using TTS and return the encoded audio bytes.
+
+    Repeated text is served from the audio cache.
+    """
+    key = audio_key(TTS_MODEL, TTS_VOICE, text)
+    if cache is not None:
+        audio_bytes = cache.get(key)
+        if audio_bytes is not None:
+            cache.clear_pending(key)
+            return audio_bytes
+
+    try:
+        response = client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text,
+            response_format=TTS_FORMAT
+        )
+        audio_bytes = response.read()
     except Exception as e:
         print(f"Error generating speech: {str(e)}")
-        return None
\ No newline at end of file
+        if cache is not None:
+            cache.clear_pending(key)
+        return None
+
+    if cache is not None:
+        try:
+            cache.set(key, audio_bytes)
+        except OSError as e:
+            # The reply can still be served from memory by this worker
+            print(f"Error caching speech: {str(e)}")
+        finally:
+            cache.clear_pending(key)
+    return audio_bytes
@@ -1,8 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, current_user
 from app import db
 from models import Appointment, DoctorSchedule
+from services.slot_store import schedule_changed, appointment_changed
+from services.notifications import notify_appointment
+from services.booking import is_slot_conflict
+from services.doctor_versions import conditional_json, get_version
+from services.calendar_feed import get_events, parse_range
+from services.ics_feed import make_token
 from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from functools import wraps
 
 doctor_bp = Blueprint('doctor', __name__)
@@ -24,19 +32,19 @@ def dashboard():
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     tomorrow = today + timedelta(days=1)
 
-    today_appointments = Appointment.query.filter(
+    today_appointments = Appointment.query.options(joinedload(Appointment.patient)).filter(
         Appointment.doctor_id == current_user.id,
         Appointment.datetime >= today,
         Appointment.datetime < tomorrow
     ).order_by(Appointment.datetime).all()
 
-    upcoming_appointments = Appointment.query.filter(
+    upcoming_appointments = Appointment.query.options(joinedload(Appointment.patient)).filter(
         Appointment.doctor_id == current_user.id,
         Appointment.datetime >= tomorrow,
         Appointment.status != 'cancelled'
     ).order_by(Appointment.datetime).limit(5).all()
 
-    pending_appointments = Appointment.query.filter_by(
+    pending_appointments = Appointment.query.options(joinedload(Appointment.patient)).filter_by(
         doctor_id=current_user.id,
         status='pending'
     ).all()
@@ -44,7 +52,9 @@ def dashboard():
     return render_template('doctor/dashboard.html',
                          today_appointments=today_appointments,
                          upcoming_appointments=upcoming_appointments,
-                         pending_appointments=pending_appointments)
+                         pending_appointments=pending_appointments,
+                         calendar_feed_url=url_for('calendar.ics_feed', token=make_token(db.session, current_user.id),
+                                                   _external=True))
 
 @doctor_bp.route('/schedule', methods=['GET', 'POST'])
 @login_required
@@ -79,6 +89,7 @@ def manage_schedule():
 
         try:
             db.session.add(new_schedule)
+            schedule_changed(current_user.id, day)
             db.session.commit()
             flash('Schedule added successfully', 'success')
         except Exception as e:
@@ -129,6 +140,7 @@ def delete_schedule(schedule_id):
             return redirect(url_for('doctor.manage_schedule'))
 
         db.session.delete(schedule)
+        schedule_changed(current_user.id, schedule.day_of_week)
         db.session.commit()
         flash('Schedule removed successfully', 'success')
     except Exception as e:
@@ -144,14 +156,37 @@ def today_appointments_count():
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     tomorrow = today + timedelta(days=1)
 
-    count = Appointment.query.filter(
-        Appointment.doctor_id == current_user.id,
-        Appointment.datetime >= today,
-        Appointment.datetime < tomorrow,
-        Appointment.status != 'cancelled'
-    ).count()
+    def count():
+        return {'count': Appointment.query.filter(
+            Appointment.doctor_id == current_user.id,
+            Appointment.datetime >= today,
+            Appointment.datetime < tomorrow,
+            Appointment.status != 'cancelled'
+        ).count()}
+
+    etag = f"today-{current_user.id}-{get_version(db.session, current_user.id)}-{today:%Y%m%d}"
+    return conditional_json(etag, count)
+
+@doctor_bp.route('/api/calendar_events')
+@login_required
+@doctor_required
+def calendar_events():
+    """FullCalendar feed for the visible window, revalidated with the doctor's ETag"""
+    try:
+        start, end = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    version = get_version(db.session, current_user.id)
+    etag = f"calendar-{current_user.id}-{version}-{start:%Y%m%d%H%M}-{end:%Y%m%d%H%M}"
+    return conditional_json(etag, lambda: get_events(db.session, 'doctor', current_user.id,
+                                                     start, end, version=version))
 
-    return jsonify({'count': count})
+# action: (new status, statuses it may be applied to, flash message)
+STATUS_TRANSITIONS = {
+    'confirm': ('confirmed', ('pending',), 'Appointment confirmed'),
+    'cancel': ('cancelled', ('pending', 'confirmed'), 'Appointment cancelled'),
+}
 
 @doctor_bp.route('/appointment/<int:appointment_id>/<action>')
 @login_required
@@ -163,12 +198,27 @@ def handle_appointment(appointment_id, action):
         flash('Unauthorized access')
         return redirect(url_for('doctor.dashboard'))
 
-    if action == 'confirm':
-        appointment.status = 'confirmed'
-        flash('Appointment confirmed')
-    elif action == 'cancel':
-        appointment.status = 'cancelled'
-        flash('Appointment cancelled')
+    if action not in STATUS_TRANSITIONS:
+        abort(404)
+
+    new_status, allowed_from, message = STATUS_TRANSITIONS[action]
+    if appointment.status not in allowed_from:
+        flash(f'Cannot {action} an appointment that is {appointment.status}')
+        return redirect(url_for('doctor.dashboard'))
+
+    appointment.status = new_status
+    try:
+        db.session.flush()
+        notify_appointment(appointment, appointment.patient_id)
+        appointment_changed(appointment)
+        db.session.commit()
+    except IntegrityError as e:
+        # uq_appointment_doctor_slot_active still guards the slot against a concurrent booking
+        db.session.rollback()
+        if not is_slot_conflict(e):
+            raise
+        flash('This time slot is already taken')
+        return redirect(url_for('doctor.dashboard'))
 
-    db.session.commit()
+    flash(message)
     return redirect(url_for('doctor.dashboard'))
\ No newline at end of file
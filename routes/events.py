@@ -0,0 +1,62 @@
+from flask import Blueprint, Response, jsonify, current_app, stream_with_context
+from flask_login import login_required, current_user
+from app import db
+from services.events import broker, counts_for, ensure_listener
+import json
+import queue
+import time
+
+events_bp = Blueprint('events', __name__)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@events_bp.route('/events')
+@login_required
+def stream():
+    """Server-Sent Events: appointment changes and updated counts for the current user.
+
+    Each stream holds a worker thread, so a worker serves at most
+    EVENTS_MAX_STREAMS of them and closes each after EVENTS_STREAM_TIMEOUT
+    seconds; EventSource reconnects on its own. A client that went away is
+    noticed when the next keepalive fails to write, within EVENTS_KEEPALIVE
+    seconds. Only the dashboards open a stream.
+    """
+    if current_user.role not in ('doctor', 'patient'):
+        return jsonify({'error': 'Live updates are only available to doctors and patients'}), 403
+
+    ensure_listener()
+    user_id = current_user.id
+    role = current_user.role
+    events = broker.subscribe(user_id, current_app.config.get('EVENTS_MAX_STREAMS', 2))
+    if events is None:
+        return jsonify({'error': 'Too many live connections'}), 503, {'Retry-After': '30'}
+
+    keepalive = current_app.config.get('EVENTS_KEEPALIVE', 5)
+    deadline = time.monotonic() + current_app.config.get('EVENTS_STREAM_TIMEOUT', 300)
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            yield sse('counts', counts_for(db.session, user_id, role))
+            while time.monotonic() < deadline:
+                try:
+                    payloads = [events.get(timeout=keepalive)]
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+
+                # Coalesce a burst into one counts update
+                while True:
+                    try:
+                        payloads.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+                for payload in payloads:
+                    yield sse('appointment', payload)
+                yield sse('counts', counts_for(db.session, user_id, role))
+        finally:
+            broker.unsubscribe(user_id, events)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,9 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
-from models import User, Appointment, DoctorSchedule
+from models import Appointment
+from services.availability import merge_available_slots
+from services.slot_store import get_available_slots, get_available_slots_by_doctor, appointment_changed
+from services.booking import BookingError, book_appointment as book_appointment_slot
+from services.notifications import notify_appointment
+from services.doctor_versions import conditional_json, get_version
+from services.calendar_feed import get_events, parse_range
+from services.ics_feed import make_token
+from services.doctor_directory import get_doctors
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from functools import wraps
+import time
 
 patient_bp = Blueprint('patient', __name__)
 
@@ -16,18 +26,28 @@ def patient_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def serialize_slot(slot):
+    return {
+        'datetime': slot.strftime('%Y-%m-%d %H:%M'),
+        'date': slot.strftime('%Y-%m-%d'),
+        'time': slot.strftime('%H:%M'),
+        'display': slot.strftime('%A, %B %d at %I:%M %p')
+    }
+
 @patient_bp.route('/dashboard')
 @login_required
 @patient_required
 def dashboard():
     now = datetime.utcnow()
-    upcoming_appointments = Appointment.query.filter(
+    upcoming_appointments = Appointment.query.options(joinedload(Appointment.doctor)).filter(
         Appointment.patient_id == current_user.id,
         Appointment.datetime >= now
     ).order_by(Appointment.datetime).all()
     return render_template('patient/dashboard.html',
                          upcoming_appointments=upcoming_appointments,
-                         now=now)
+                         now=now,
+                         calendar_feed_url=url_for('calendar.ics_feed', token=make_token(db.session, current_user.id),
+                                                   _external=True))
 
 @patient_bp.route('/book_appointment', methods=['GET', 'POST'])
 @login_required
@@ -55,49 +75,14 @@ def book_appointment():
                 flash('Appointments can only be booked within the next 7 days', 'error')
                 return redirect(url_for('patient.book_appointment'))
 
-            doctor = User.query.filter_by(id=doctor_id, role='doctor').first()
-            if not doctor:
-                flash('Selected doctor is not available', 'error')
-                return redirect(url_for('patient.book_appointment'))
-
-            schedule = DoctorSchedule.query.filter_by(
-                doctor_id=doctor_id,
-                day_of_week=appointment_datetime.weekday()
-            ).first()
-
-            if not schedule:
-                flash('Doctor is not available on the selected day', 'error')
-                return redirect(url_for('patient.book_appointment'))
-
-            available_slots = schedule.get_available_slots(appointment_datetime.date())
-            if not any(slot.time() == appointment_datetime.time() for slot in available_slots):
-                flash('Selected time slot is not available', 'error')
-                return redirect(url_for('patient.book_appointment'))
-
-            existing_appointment = Appointment.query.filter_by(
-                doctor_id=doctor_id,
-                datetime=appointment_datetime,
-                status='confirmed'
-            ).first()
-
-            if existing_appointment:
-                flash('This time slot is already booked', 'error')
-                return redirect(url_for('patient.book_appointment'))
-
-            appointment = Appointment(
-                doctor_id=doctor_id,
-                patient_id=current_user.id,
-                datetime=appointment_datetime,
-                notes=notes,
-                status='pending'
-            )
-
-            db.session.add(appointment)
-            db.session.commit()
+            book_appointment_slot(doctor_id, current_user.id, appointment_datetime, notes=notes)
 
             flash('Appointment requested successfully! You will be notified once the doctor confirms.', 'success')
             return redirect(url_for('patient.dashboard'))
 
+        except BookingError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('patient.book_appointment'))
         except ValueError:
             flash('Invalid date or time format', 'error')
             return redirect(url_for('patient.book_appointment'))
@@ -106,7 +91,7 @@ def book_appointment():
             flash('An error occurred while booking the appointment. Please try again.', 'error')
             return redirect(url_for('patient.book_appointment'))
 
-    doctors = User.query.filter_by(role='doctor').all()
+    doctors = get_doctors(db.session)
     today = datetime.utcnow().date()
     next_week = today + timedelta(days=7)
 
@@ -119,45 +104,103 @@ def book_appointment():
 @login_required
 @patient_required
 def get_doctor_available_slots(doctor_id):
+    """Free slots for the next week, revalidated with a per-doctor ETag.
+
+    Slots starting before the end of the current SLOT_ETAG_WINDOW are left
+    out, so a response stays correct for as long as its ETag does.
+    """
     try:
+        window = current_app.config.get('SLOT_ETAG_WINDOW', 300)
+        epoch = int(time.time()) // window
+        not_before = datetime.utcfromtimestamp((epoch + 1) * window)
         today = datetime.utcnow().date()
         next_week = today + timedelta(days=7)
 
-        schedules = DoctorSchedule.query.filter_by(doctor_id=doctor_id).all()
-
-        available_slots = []
-        current_date = today
-
-        while current_date <= next_week:
-            for schedule in schedules:
-                if current_date.weekday() == schedule.day_of_week:
-                    slots = schedule.get_available_slots(current_date)
-                    filtered_slots = []
-                    for slot in slots:
-                        if slot <= datetime.utcnow():
-                            continue
-                        existing_appointment = Appointment.query.filter_by(
-                            doctor_id=doctor_id,
-                            datetime=slot,
-                            status='confirmed'
-                        ).first()
-                        if not existing_appointment:
-                            filtered_slots.append({
-                                'datetime': slot.strftime('%Y-%m-%d %H:%M'),
-                                'date': slot.strftime('%Y-%m-%d'),
-                                'time': slot.strftime('%H:%M'),
-                                'display': slot.strftime('%A, %B %d at %I:%M %p')
-                            })
-
-                    if filtered_slots:
-                        available_slots.extend(filtered_slots)
-            current_date += timedelta(days=1)
-
-        return jsonify({'slots': sorted(available_slots, key=lambda x: x['datetime'])})
+        etag = f"slots-{doctor_id}-{get_version(db.session, doctor_id)}-{epoch}"
+        return conditional_json(etag, lambda: {
+            'slots': [serialize_slot(slot) for slot in
+                      get_available_slots(doctor_id, today, next_week, not_before=not_before)]
+        })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@patient_bp.route('/api/available_slots')
+@login_required
+@patient_required
+def search_available_slots():
+    """Available slots for several doctors at once.
+
+    Accepts ``doctor_ids`` (comma separated or repeated) and/or
+    ``specialization_id`` plus an optional ``start``/``end`` date window
+    (YYYY-MM-DD, clamped to the 7-day booking horizon). Doctors come from
+    the cached directory; slots take two queries, schedules and bookings.
+    """
+    try:
+        doctor_ids = []
+        for value in request.args.getlist('doctor_ids'):
+            doctor_ids.extend(int(part) for part in value.split(',') if part.strip())
+        specialization_id = request.args.get('specialization_id', type=int)
+
+        if not doctor_ids and specialization_id is None:
+            return jsonify({'error': 'doctor_ids or specialization_id is required'}), 400
+
+        today = datetime.utcnow().date()
+        next_week = today + timedelta(days=7)
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else today
+        end_date = datetime.strptime(end, '%Y-%m-%d').date() if end else next_week
+        start_date = max(start_date, today)
+        end_date = min(end_date, next_week)
+    except ValueError:
+        return jsonify({'error': 'Invalid doctor id or date format'}), 400
+
+    try:
+        wanted = set(doctor_ids)
+        doctors = {
+            doctor.id: doctor for doctor in get_doctors(db.session)
+            if (not wanted or doctor.id in wanted)
+            and (specialization_id is None or doctor.specialization_id == specialization_id)
+        }
+
+        slots_by_doctor = {}
+        if doctors and start_date <= end_date:
+            slots_by_doctor = get_available_slots_by_doctor(
+                doctors.keys(), start_date, end_date, not_before=datetime.utcnow()
+            )
+
+        slots = [
+            {**serialize_slot(slot), 'doctor_id': doctor_id}
+            for slot, doctor_id in merge_available_slots(slots_by_doctor)
+        ]
+
+        return jsonify({
+            'doctors': {
+                doctor.id: {
+                    'name': f"Dr. {doctor.first_name} {doctor.last_name}",
+                    'specialization': doctor.specialization.name if doctor.specialization else None
+                }
+                for doctor in doctors.values()
+            },
+            'slots': slots
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@patient_bp.route('/api/calendar_events')
+@login_required
+@patient_required
+def calendar_events():
+    """FullCalendar feed of the patient's appointments in the visible window"""
+    try:
+        start, end = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(get_events(db.session, 'patient', current_user.id, start, end))
+
 @patient_bp.route('/appointment/<int:appointment_id>/cancel')
 @login_required
 @patient_required
@@ -173,6 +216,8 @@ def cancel_appointment(appointment_id):
         return redirect(url_for('patient.dashboard'))
 
     appointment.status = 'cancelled'
+    appointment_changed(appointment)
+    notify_appointment(appointment, appointment.doctor_id)
     db.session.commit()
 
     flash('Appointment cancelled successfully', 'success')
@@ -0,0 +1,10 @@
+from app import create_app
+
+app = create_app()
+
+if __name__ == "__main__":
+    from services.reminders import run_scheduler
+
+    # Runs next to the web server; reminders go out through `flask notifications-worker`
+    with app.app_context():
+        run_scheduler()
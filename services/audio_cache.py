@@ -0,0 +1,156 @@
+"""Content-addressed cache for synthesized speech.
+
+Keys are SHA-256 digests of (model, voice, text). Lookups go to a small
+in-process LRU first and then to a size-bounded directory shared by every
+gunicorn worker on the host. Files are written atomically, and the least
+recently used ones are evicted once the directory grows past its limit.
+A worker generating an entry leaves a pending marker next to it so the
+other workers know to wait for the file rather than report it missing.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+TEMP_PREFIX = '.tmp-'
+PENDING_PREFIX = '.pending-'
+TEMP_GRACE_SECONDS = 600  # older temp files and markers were left behind by a crashed writer
+
+
+def audio_key(model, voice, text):
+    return hashlib.sha256(f'{model}\0{voice}\0{text}'.encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    def __init__(self, directory, memory_bytes=16 * 1024 * 1024, disk_bytes=512 * 1024 * 1024,
+                 evict_every=32):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.evict_every = evict_every
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        # Fan out into subdirectories so no single directory grows huge
+        return os.path.join(self.directory, key[:2], key)
+
+    def pending_path_for(self, key):
+        return os.path.join(self.directory, key[:2], PENDING_PREFIX + key)
+
+    def mark_pending(self, key):
+        """Best effort: without a marker other workers answer 404 instead of waiting"""
+        path = self.pending_path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb'):
+                pass
+        except OSError:
+            pass
+
+    def clear_pending(self, key):
+        try:
+            os.unlink(self.pending_path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def is_pending(self, key):
+        """True while some worker on this host is generating ``key``"""
+        try:
+            return time.time() - os.stat(self.pending_path_for(key)).st_mtime < TEMP_GRACE_SECONDS
+        except FileNotFoundError:
+            return False
+
+    def get(self, key):
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                return data
+
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as cached:
+                data = cached.read()
+            os.utime(path)  # mark as recently used for disk eviction
+        except FileNotFoundError:
+            return None
+
+        self.remember(key, data)
+        return data
+
+    def set(self, key, data):
+        self.remember(key, data)
+
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self.lock:
+            self.writes += 1
+            should_evict = self.writes % self.evict_every == 0
+        if should_evict:
+            self.evict_disk()
+
+    def remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self.lock:
+            previous = self.memory.pop(key, None)
+            if previous is not None:
+                self.memory_size -= len(previous)
+            self.memory[key] = data
+            self.memory_size += len(data)
+            while self.memory_size > self.memory_bytes:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_size -= len(evicted)
+
+    def evict_disk(self):
+        """Delete least recently used files until the directory fits its budget.
+
+        Temp files and pending markers may belong to another worker's
+        in-flight work and are only removed once they are older than
+        ``TEMP_GRACE_SECONDS``.
+        """
+        entries = []
+        total = 0
+        stale_before = time.time() - TEMP_GRACE_SECONDS
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.startswith((TEMP_PREFIX, PENDING_PREFIX)):
+                    if stat.st_mtime < stale_before:
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except FileNotFoundError:
+                pass
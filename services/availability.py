@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from heapq import merge
+from models import Appointment, DoctorSchedule
+
+
+def expand_schedule(schedule, date):
+    """Return every candidate slot start for a schedule on the given date"""
+    if date.weekday() != schedule.day_of_week:
+        return []
+
+    step = timedelta(minutes=schedule.slot_duration)
+    current_time = datetime.combine(date, schedule.start_time)
+    end_datetime = datetime.combine(date, schedule.end_time)
+
+    slots = []
+    while current_time + step <= end_datetime:
+        slots.append(current_time)
+        current_time += step
+    return slots
+
+def get_booked_slots(doctor_id, start, end):
+    """Return the set of taken appointment datetimes in [start, end)"""
+    return get_booked_slots_by_doctor([doctor_id], start, end).get(doctor_id, set())
+
+def get_booked_slots_by_doctor(doctor_ids, start, end, session=None):
+    """Return taken appointment datetimes in [start, end) keyed by doctor.
+
+    Pending requests hold their slot too: the unique active-slot index
+    would reject a second booking for it anyway.
+    """
+    query = session.query(Appointment) if session is not None else Appointment.query
+    rows = query.with_entities(Appointment.doctor_id, Appointment.datetime).filter(
+        Appointment.doctor_id.in_(doctor_ids),
+        Appointment.datetime >= start,
+        Appointment.datetime < end,
+        Appointment.status != 'cancelled'
+    ).all()
+
+    booked = {}
+    for row in rows:
+        booked.setdefault(row.doctor_id, set()).add(row.datetime)
+    return booked
+
+def get_available_slots_by_doctor(doctor_ids, start_date, end_date, not_before=None, schedules=None,
+                                  session=None):
+    """Return sorted free slots between two dates (inclusive) keyed by doctor.
+
+    Costs at most two queries for the whole cohort regardless of the
+    horizon: one for the schedules (skipped when ``schedules`` is passed
+    in) and one range query for the taken appointments in the window.
+    ``session`` defaults to the request session.
+    """
+    doctor_ids = list(doctor_ids)
+    if not doctor_ids:
+        return {}
+
+    if schedules is None:
+        query = session.query(DoctorSchedule) if session is not None else DoctorSchedule.query
+        schedules = query.filter(DoctorSchedule.doctor_id.in_(doctor_ids)).all()
+
+    schedules_by_day = {}
+    for schedule in schedules:
+        schedules_by_day.setdefault(schedule.day_of_week, []).append(schedule)
+
+    available = {doctor_id: [] for doctor_id in doctor_ids}
+    if not schedules_by_day:
+        return available
+
+    window_start = datetime.combine(start_date, datetime.min.time())
+    window_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    booked = get_booked_slots_by_doctor(doctor_ids, window_start, window_end, session=session)
+
+    current_date = start_date
+    while current_date <= end_date:
+        for schedule in schedules_by_day.get(current_date.weekday(), []):
+            doctor_booked = booked.get(schedule.doctor_id, ())
+            for slot in expand_schedule(schedule, current_date):
+                if slot in doctor_booked:
+                    continue
+                if not_before is not None and slot <= not_before:
+                    continue
+                available.setdefault(schedule.doctor_id, []).append(slot)
+        current_date += timedelta(days=1)
+
+    for slots in available.values():
+        slots.sort()
+    return available
+
+def get_available_slots(doctor_id, start_date, end_date, not_before=None, schedules=None):
+    """Return sorted free slots for a single doctor between two dates (inclusive)"""
+    return get_available_slots_by_doctor(
+        [doctor_id], start_date, end_date, not_before=not_before, schedules=schedules
+    ).get(doctor_id, [])
+
+def merge_available_slots(slots_by_doctor):
+    """Merge per-doctor sorted slot lists into one (datetime, doctor_id) stream"""
+    return merge(*(
+        [(slot, doctor_id) for slot in slots]
+        for doctor_id, slots in slots_by_doctor.items()
+    ))
@@ -0,0 +1,74 @@
+"""Appointment booking with a database-enforced one-active-per-slot rule.
+
+There is no check-then-insert race to lose: the insert is attempted
+directly and the ``uq_appointment_doctor_slot_active`` index rejects a
+second active appointment for the same doctor and slot. A losing request
+gets ``SlotTakenError`` straight away instead of retrying.
+"""
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Appointment, DoctorSchedule, User
+from services.availability import expand_schedule
+from services.slot_store import appointment_changed
+from services.notifications import notify_appointment
+
+
+class BookingError(Exception):
+    """The requested appointment cannot be booked"""
+
+class SlotTakenError(BookingError):
+    """Another active appointment already holds the slot"""
+
+
+SLOT_INDEX = 'uq_appointment_doctor_slot_active'
+
+def is_slot_conflict(error):
+    """True when the ``IntegrityError`` was raised by the active-slot index"""
+    constraint = getattr(getattr(error.orig, 'diag', None), 'constraint_name', None)
+    if constraint:
+        return constraint == SLOT_INDEX
+    # SQLite names the columns rather than the index
+    message = str(error.orig)
+    return SLOT_INDEX in message or 'appointment.doctor_id, appointment.datetime' in message
+
+def is_schedule_slot(doctor_id, slot):
+    """Check that ``slot`` starts one of the doctor's scheduled slots"""
+    schedules = DoctorSchedule.query.filter_by(
+        doctor_id=doctor_id,
+        day_of_week=slot.weekday()
+    ).all()
+    return any(slot in expand_schedule(schedule, slot.date()) for schedule in schedules)
+
+def book_appointment(doctor_id, patient_id, slot, notes=None):
+    """Create a pending appointment or raise ``BookingError``/``SlotTakenError``.
+
+    Commits on success and rolls the session back on failure.
+    """
+    doctor = User.query.filter_by(id=doctor_id, role='doctor').first()
+    if not doctor:
+        raise BookingError('Selected doctor is not available')
+
+    if not is_schedule_slot(doctor.id, slot):
+        raise BookingError('Selected time slot is not available')
+
+    appointment = Appointment(
+        doctor_id=doctor.id,
+        patient_id=patient_id,
+        datetime=slot,
+        notes=notes,
+        status='pending'
+    )
+
+    try:
+        db.session.add(appointment)
+        db.session.flush()
+        appointment_changed(appointment)
+        notify_appointment(appointment, doctor.id)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_slot_conflict(e):
+            raise
+        raise SlotTakenError('This time slot is already booked')
+
+    return appointment
@@ -0,0 +1,114 @@
+"""Appointment events for the dashboard calendars (FullCalendar JSON feed).
+
+FullCalendar asks for one visible window at a time (``start``/``end``).
+Each window is answered from a single indexed range query on
+``(doctor_id, datetime, status)`` or ``(patient_id, datetime)`` and kept
+in a small per-process cache keyed by user and window. Doctor entries are
+also keyed by the doctor's change version; commits that touch an
+appointment drop both parties' entries on this worker, and other workers'
+patient entries expire after ``CALENDAR_CACHE_TTL`` seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, aliased
+from models import Appointment, User
+
+MAX_ENTRIES = 1024
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def parse_bound(value):
+    """FullCalendar sends ISO 8601, with or without an offset; return naive UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_range(args):
+    """Read and validate ``start``/``end``; raises ValueError"""
+    if not args.get('start') or not args.get('end'):
+        raise ValueError('start and end are required')
+    start = parse_bound(args['start'])
+    end = parse_bound(args['end'])
+    if end <= start:
+        raise ValueError('end must be after start')
+    if (end - start).days > current_app.config.get('CALENDAR_MAX_RANGE_DAYS', 62):
+        raise ValueError('Requested range is too long')
+    return start, end
+
+def fetch_events(session, role, user_id, start, end):
+    other = aliased(User)
+    if role == 'doctor':
+        owner, counterpart, prefix = Appointment.doctor_id, Appointment.patient_id, ''
+    else:
+        owner, counterpart, prefix = Appointment.patient_id, Appointment.doctor_id, 'Dr. '
+
+    rows = session.execute(
+        select(Appointment.id, Appointment.datetime, Appointment.status,
+               other.first_name, other.last_name)
+        .join(other, counterpart == other.id)
+        .where(
+            owner == user_id,
+            Appointment.datetime >= start,
+            Appointment.datetime < end,
+            Appointment.status != 'cancelled'
+        )
+        .order_by(Appointment.datetime)
+    )
+    return [
+        {
+            'id': appointment_id,
+            'title': f"{prefix}{first_name} {last_name}",
+            'start': when.strftime('%Y-%m-%dT%H:%M'),
+            'status': status,
+        }
+        for appointment_id, when, status, first_name, last_name in rows
+    ]
+
+def get_events(session, role, user_id, start, end, version=None):
+    """Cached events for one window; ``version`` ties doctor entries to their change version"""
+    key = (role, user_id, start, end, version)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and now < entry[1]:
+            _cache.move_to_end(key)
+            return entry[0]
+
+    events = fetch_events(session, role, user_id, start, end)
+    with _lock:
+        _cache[key] = (events, now + current_app.config.get('CALENDAR_CACHE_TTL', 30))
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return events
+
+def invalidate(user_ids):
+    user_ids = set(user_ids)
+    with _lock:
+        for key in [key for key in _cache if key[1] in user_ids]:
+            del _cache[key]
+
+@event.listens_for(Session, 'after_flush')
+def _track_appointment_writes(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Appointment):
+            session.info.setdefault('calendar_dirty', set()).update(
+                (instance.doctor_id, instance.patient_id)
+            )
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop('calendar_dirty', None)
+    if user_ids:
+        invalidate(user_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('calendar_dirty', None)
@@ -0,0 +1,171 @@
+"""Server-side state for chatbot flows.
+
+The signed cookie only carries a random ``chat_sid``; the flow state itself
+(current flow, partially filled forms, the doctor and slot menus shown to
+the user) lives in a store and is written back only when it changes.
+Slot menus are kept as minute offsets from the first slot rather than as
+serialized datetimes, so a week of slots is a few hundred bytes.
+
+``CHAT_STATE_BACKEND`` selects the store: ``memory`` (default, per
+process) or ``database`` (the ``chat_session`` table, shared by every
+worker). Idle state expires after ``CHAT_STATE_TTL`` seconds.
+"""
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app, g, session
+from sqlalchemy import delete, insert, select, update
+from werkzeug.local import LocalProxy
+
+SESSION_KEY = 'chat_sid'
+EPOCH = datetime(1970, 1, 1)
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def to_minutes(value):
+    return int((value - EPOCH).total_seconds()) // 60
+
+def from_minutes(minutes):
+    return EPOCH + timedelta(minutes=minutes)
+
+def pack_slots(slots):
+    """Encode sorted slot datetimes as ``[base_minutes, offset, offset, ...]``"""
+    if not slots:
+        return []
+    base = to_minutes(slots[0])
+    return [base] + [to_minutes(slot) - base for slot in slots[1:]]
+
+def unpack_slots(packed):
+    if not packed:
+        return []
+    base = packed[0]
+    return [from_minutes(base)] + [from_minutes(base + offset) for offset in packed[1:]]
+
+def encode(state):
+    return json.dumps(state, separators=(',', ':'), sort_keys=True)
+
+def decode(data):
+    return json.loads(data) if data else {}
+
+
+class MemoryChatStore:
+    """Per-process LRU of encoded states with a TTL"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, sid):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[sid]
+                return None
+            self.entries.move_to_end(sid)
+            return data
+
+    def set(self, sid, data, ttl):
+        with self.lock:
+            self.entries[sid] = (data, time.monotonic() + ttl)
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self.lock:
+            self.entries.pop(sid, None)
+
+
+class DatabaseChatStore:
+    """Shared store on the ``chat_session`` table.
+
+    Uses its own short transactions so saving chat state never commits or
+    rolls back whatever the view left in ``db.session``.
+    """
+
+    def __init__(self, engine, purge_every=500):
+        self.engine = engine
+        self.purge_every = purge_every
+        self.writes = 0
+
+    def get(self, sid):
+        from models import ChatSession
+
+        with self.engine.connect() as connection:
+            return connection.scalar(
+                select(ChatSession.data).where(
+                    ChatSession.id == sid,
+                    ChatSession.expires_at > datetime.utcnow()
+                )
+            )
+
+    def set(self, sid, data, ttl):
+        from models import ChatSession
+
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                update(ChatSession).where(ChatSession.id == sid)
+                .values(data=data, expires_at=expires_at)
+            )
+            if not result.rowcount:
+                connection.execute(insert(ChatSession).values(id=sid, data=data, expires_at=expires_at))
+
+            self.writes += 1
+            if self.writes % self.purge_every == 0:
+                connection.execute(delete(ChatSession).where(ChatSession.expires_at <= datetime.utcnow()))
+
+    def delete(self, sid):
+        from models import ChatSession
+
+        with self.engine.begin() as connection:
+            connection.execute(delete(ChatSession).where(ChatSession.id == sid))
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if current_app.config.get('CHAT_STATE_BACKEND') == 'database':
+                from app import db
+                _store = DatabaseChatStore(db.engine)
+            else:
+                _store = MemoryChatStore()
+    return _store
+
+def load_state():
+    """The chat state for this request, loaded once and kept on ``g``"""
+    if 'chat_state' not in g:
+        sid = session.get(SESSION_KEY)
+        data = get_store().get(sid) if sid else None
+        g.chat_state_loaded = data
+        g.chat_state = decode(data)
+    return g.chat_state
+
+def save_state(response):
+    """after_request hook: persist the state if the view changed it"""
+    if 'chat_state' not in g:
+        return response
+
+    data = encode(g.chat_state) if g.chat_state else None
+    sid = session.get(SESSION_KEY)
+    if data is None:
+        if sid:
+            get_store().delete(sid)
+            session.pop(SESSION_KEY)
+    elif data != g.chat_state_loaded or sid is None:
+        if sid is None:
+            sid = session[SESSION_KEY] = secrets.token_urlsafe(16)
+        get_store().set(sid, data, current_app.config.get('CHAT_STATE_TTL', 1800))
+    return response
+
+chat_state = LocalProxy(load_state)
@@ -0,0 +1,91 @@
+"""In-memory snapshot of the doctor list for the booking page, chatbot and admin.
+
+The snapshot is a tuple of read-only ``DoctorEntry`` rows, built with one
+joined query and tagged with the directory version it was built from.
+The version lives in the ``cache_version`` table so every worker sees it:
+``bump()`` advances it whenever a doctor is created, and each worker
+compares it with its snapshot at most every
+``DOCTOR_DIRECTORY_CHECK_INTERVAL`` seconds (one primary-key lookup).
+``DOCTOR_DIRECTORY_TTL`` caps how long a snapshot is kept regardless.
+"""
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import select, update
+from app import db
+from models import CacheVersion, Specialization, User
+
+VERSION_NAME = 'doctor_directory'
+
+SpecializationEntry = namedtuple('SpecializationEntry', 'id name')
+DoctorEntry = namedtuple('DoctorEntry', 'id email first_name last_name specialization_id specialization')
+
+_directory = {'built_version': None, 'doctors': (), 'by_id': {}, 'checked_at': 0.0, 'expires_at': 0.0}
+_lock = threading.Lock()
+
+
+def load_doctors(session):
+    rows = session.execute(
+        select(User.id, User.email, User.first_name, User.last_name,
+               User.specialization_id, Specialization.name)
+        .outerjoin(Specialization, User.specialization_id == Specialization.id)
+        .where(User.role == 'doctor')
+        .order_by(User.id)
+    )
+    return tuple(
+        DoctorEntry(doctor_id, email, first_name, last_name, specialization_id,
+                    SpecializationEntry(specialization_id, name) if specialization_id else None)
+        for doctor_id, email, first_name, last_name, specialization_id, name in rows
+    )
+
+def stored_version(session):
+    return session.scalar(select(CacheVersion.version).where(CacheVersion.name == VERSION_NAME)) or 0
+
+def is_fresh(session, now):
+    """True when the snapshot is within its TTL and matches the stored version"""
+    if _directory['built_version'] is None or now >= _directory['expires_at']:
+        return False
+    interval = current_app.config.get('DOCTOR_DIRECTORY_CHECK_INTERVAL', 5)
+    if now < _directory['checked_at'] + interval:
+        return True
+    if stored_version(session) != _directory['built_version']:
+        return False
+    _directory['checked_at'] = now
+    return True
+
+def get_doctors(session):
+    """Every doctor ordered by id, rebuilt when the version or TTL says so"""
+    if is_fresh(session, time.monotonic()):
+        return _directory['doctors']
+
+    with _lock:
+        now = time.monotonic()
+        if is_fresh(session, now):
+            return _directory['doctors']
+        version = stored_version(session)
+        doctors = load_doctors(session)
+        _directory['doctors'] = doctors
+        _directory['by_id'] = {doctor.id: doctor for doctor in doctors}
+        _directory['built_version'] = version
+        _directory['checked_at'] = now
+        _directory['expires_at'] = now + current_app.config.get('DOCTOR_DIRECTORY_TTL', 60)
+    return doctors
+
+def get_doctor(session, doctor_id):
+    """One doctor's entry, or None if the id is not a doctor"""
+    get_doctors(session)
+    return _directory['by_id'].get(doctor_id)
+
+def version():
+    return _directory['built_version']
+
+def bump():
+    """Call after committing a new or changed doctor; every worker rebuilds"""
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(CacheVersion).where(CacheVersion.name == VERSION_NAME)
+            .values(version=CacheVersion.version + 1)
+        )
+    with _lock:
+        _directory['built_version'] = None  # this worker rebuilds right away
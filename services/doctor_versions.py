@@ -0,0 +1,95 @@
+"""Per-doctor change version for conditional GETs.
+
+Doctors whose ``Appointment`` or ``DoctorSchedule`` rows are inserted,
+updated or deleted in a flush are remembered on the session, and their
+rows in ``doctor_version`` are bumped in a separate short transaction
+once the change commits. The booking transaction itself never locks the
+version row, so concurrent bookings for one doctor are not serialized
+behind it; the new data is visible before the new version, so a client
+can at worst refetch once, never keep a stale copy. Endpoints derived
+from those rows build a strong ETag from the version and answer
+``If-None-Match`` with 304 after a single primary-key lookup, before any
+slot expansion or counting runs.
+"""
+import logging
+from flask import jsonify, make_response, request
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from models import Appointment, DoctorSchedule, DoctorVersion
+
+logger = logging.getLogger(__name__)
+
+def get_version(session, doctor_id):
+    return session.scalar(
+        select(DoctorVersion.version).where(DoctorVersion.doctor_id == doctor_id)
+    ) or 0
+
+def bump(connection, doctor_ids):
+    """Increment the version of each doctor on ``connection``, creating rows as needed"""
+    doctor_ids = sorted(set(doctor_ids))  # fixed lock order across transactions
+    if not doctor_ids:
+        return
+
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(DoctorVersion).values([
+            {'doctor_id': doctor_id, 'version': 1} for doctor_id in doctor_ids
+        ])
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['doctor_id'],
+            set_={'version': DoctorVersion.version + 1}
+        ))
+        return
+
+    for doctor_id in doctor_ids:
+        result = connection.execute(
+            update(DoctorVersion).where(DoctorVersion.doctor_id == doctor_id)
+            .values(version=DoctorVersion.version + 1)
+        )
+        if not result.rowcount:
+            connection.execute(insert(DoctorVersion).values(doctor_id=doctor_id, version=1))
+
+def conditional_json(etag, build, max_age=0):
+    """Return 304 if the client holds ``etag``, otherwise ``build()`` as JSON.
+
+    ``build`` only runs when the client's copy is stale.
+    """
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    response.cache_control.must_revalidate = True
+    return response
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_doctors(session, flush_context):
+    doctor_ids = {
+        instance.doctor_id
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(instance, (Appointment, DoctorSchedule)) and instance.doctor_id
+    }
+    if doctor_ids:
+        session.info.setdefault('doctor_versions_dirty', set()).update(doctor_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _bump_changed_doctors(session):
+    doctor_ids = session.info.pop('doctor_versions_dirty', None)
+    if not doctor_ids:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            bump(connection, doctor_ids)
+    except Exception:
+        # The change itself is committed; clients revalidate on the next bump
+        logger.exception('Could not bump doctor versions for %s', sorted(doctor_ids))
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_doctors(session):
+    session.info.pop('doctor_versions_dirty', None)
@@ -0,0 +1,173 @@
+"""Live appointment events for the Server-Sent Events stream (routes/events.py).
+
+Appointment inserts and status changes are picked up from the session at
+flush time and delivered to the doctor's and the patient's open streams
+once the transaction commits; rolled back changes are never announced.
+
+``EVENTS_BACKEND`` selects the transport:
+
+* ``memory`` (default): an in-process broker, enough for a single worker.
+* ``postgres``: the flush issues ``pg_notify`` inside the transaction and
+  every worker runs a LISTEN thread that feeds its own broker, so a change
+  made in one worker reaches streams held by any other.
+"""
+import json
+import queue
+import select as select_module
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from models import Appointment
+
+CHANNEL = 'appointment_events'
+QUEUE_SIZE = 100
+
+
+class Broker:
+    """Per-user fan-out to the queues of open streams"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def stream_count(self):
+        with self.lock:
+            return sum(len(queues) for queues in self.subscribers.values())
+
+    def subscribe(self, user_id, max_streams):
+        """A new queue for ``user_id``, or None when this worker is at ``max_streams``"""
+        with self.lock:
+            if sum(len(queues) for queues in self.subscribers.values()) >= max_streams:
+                return None
+            events = queue.Queue(maxsize=QUEUE_SIZE)
+            self.subscribers[user_id].add(events)
+            return events
+
+    def unsubscribe(self, user_id, events):
+        with self.lock:
+            self.subscribers[user_id].discard(events)
+            if not self.subscribers[user_id]:
+                del self.subscribers[user_id]
+
+    def publish(self, user_id, payload):
+        with self.lock:
+            targets = list(self.subscribers.get(user_id, ()))
+        for events in targets:
+            try:
+                events.put_nowait(payload)
+            except queue.Full:
+                pass  # a stalled client misses events; counts resync on the next one
+
+broker = Broker()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def backend():
+    return current_app.config.get('EVENTS_BACKEND', 'memory') if has_app_context() else 'memory'
+
+def serialize(appointment, kind):
+    return {
+        'type': kind,
+        'id': appointment.id,
+        'status': appointment.status,
+        'datetime': appointment.datetime.strftime('%Y-%m-%dT%H:%M'),
+        'doctor_id': appointment.doctor_id,
+        'patient_id': appointment.patient_id,
+    }
+
+def dispatch(payload):
+    broker.publish(payload['doctor_id'], payload)
+    broker.publish(payload['patient_id'], payload)
+
+def counts_for(session, user_id, role):
+    """The numbers the dashboards show next to the live lists"""
+    now = datetime.utcnow()
+    if role == 'doctor':
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        counts = {
+            'today': session.scalar(select(func.count()).select_from(Appointment).where(
+                Appointment.doctor_id == user_id,
+                Appointment.datetime >= today,
+                Appointment.datetime < today + timedelta(days=1),
+                Appointment.status != 'cancelled'
+            )),
+            'pending': session.scalar(select(func.count()).select_from(Appointment).where(
+                Appointment.doctor_id == user_id,
+                Appointment.status == 'pending'
+            )),
+        }
+    else:
+        counts = {
+            'upcoming': session.scalar(select(func.count()).select_from(Appointment).where(
+                Appointment.patient_id == user_id,
+                Appointment.datetime >= now,
+                Appointment.status != 'cancelled'
+            )),
+        }
+    # Do not hold a pooled connection while the stream sits idle
+    session.commit()
+    return counts
+
+def listen(engine):
+    """Feed NOTIFY payloads from Postgres into this worker's broker, forever"""
+    connection = engine.raw_connection()
+    driver_connection = connection.driver_connection
+    if hasattr(driver_connection, 'poll'):
+        # psycopg2
+        driver_connection.set_isolation_level(0)
+        driver_connection.cursor().execute(f'LISTEN {CHANNEL}')
+        while True:
+            select_module.select([driver_connection], [], [], 60)
+            driver_connection.poll()
+            while driver_connection.notifies:
+                dispatch(json.loads(driver_connection.notifies.pop(0).payload))
+    else:
+        # psycopg 3
+        driver_connection.autocommit = True
+        driver_connection.execute(f'LISTEN {CHANNEL}')
+        for notify in driver_connection.notifies():
+            dispatch(json.loads(notify.payload))
+
+def ensure_listener():
+    """Start this worker's LISTEN thread on first use when the postgres backend is on"""
+    global _listener
+    if backend() != 'postgres':
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            from app import db
+            _listener = threading.Thread(target=listen, args=(db.engine,),
+                                         name='appointment-events', daemon=True)
+            _listener.start()
+
+@event.listens_for(Session, 'after_flush')
+def _collect_appointment_events(session, flush_context):
+    payloads = []
+    for instance in session.new:
+        if isinstance(instance, Appointment):
+            payloads.append(serialize(instance, 'created'))
+    for instance in session.dirty:
+        if isinstance(instance, Appointment) and inspect(instance).attrs.status.history.has_changes():
+            payloads.append(serialize(instance, instance.status))
+    if not payloads:
+        return
+
+    if backend() == 'postgres':
+        # Delivered by Postgres only if this transaction commits
+        for payload in payloads:
+            session.execute(select(func.pg_notify(CHANNEL, json.dumps(payload))))
+    else:
+        session.info.setdefault('appointment_events', []).extend(payloads)
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    for payload in session.info.pop('appointment_events', ()):
+        dispatch(payload)
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_after_rollback(session):
+    session.info.pop('appointment_events', None)
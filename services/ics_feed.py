@@ -0,0 +1,184 @@
+"""iCalendar (.ics) subscription feeds for doctors and patients.
+
+Calendar apps poll a subscription URL every few minutes, so the feed is
+built to be cheap to ask for:
+
+* The URL carries a signed token for the user, so no session is needed.
+  The token includes the user's ``calendar_feed_version``; resetting the
+  link bumps it, which revokes every URL handed out before.
+* Only appointments between ``CALENDAR_FEED_LOOKBACK_DAYS`` ago and
+  ``CALENDAR_FEED_LOOKAHEAD_DAYS`` ahead are included, read from the
+  ``(doctor_id, datetime, status)`` / ``(patient_id, datetime)`` indexes
+  however long the user's history is.
+* The ETag is derived from the doctor change versions (see
+  ``services/doctor_versions.py``) and the window's first day, so an
+  unchanged feed is answered with 304 before any appointment is read.
+* The body is streamed in ``yield_per`` batches instead of being built in
+  memory. A doctor's weekly ``DoctorSchedule`` rows become recurring
+  availability events rather than one event per slot.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import select, update
+from sqlalchemy.orm import aliased
+from models import Appointment, DoctorSchedule, DoctorVersion, User
+from services.doctor_versions import get_version
+
+TOKEN_SALT = 'calendar-feed'
+BATCH_SIZE = 500
+APPOINTMENT_MINUTES = 30  # appointments do not store a length
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt=TOKEN_SALT)
+
+def make_token(session, user_id):
+    version = session.scalar(select(User.calendar_feed_version).where(User.id == user_id))
+    return _serializer().dumps([user_id, version or 0])
+
+def read_token(session, token):
+    """``(user_id, role)`` for a valid, unrevoked ``token``, otherwise None"""
+    try:
+        payload = _serializer().loads(token)
+    except BadSignature:
+        return None
+    if not (isinstance(payload, list) and len(payload) == 2
+            and all(isinstance(value, int) for value in payload)):
+        return None
+
+    user_id, version = payload
+    row = session.execute(
+        select(User.id, User.role).where(User.id == user_id, User.calendar_feed_version == version)
+    ).first()
+    return tuple(row) if row else None
+
+def reset_token(session, user_id):
+    """Revoke the user's feed links; the caller commits"""
+    session.execute(
+        update(User).where(User.id == user_id)
+        .values(calendar_feed_version=User.calendar_feed_version + 1)
+    )
+
+def feed_window(now=None):
+    """Start and end of the feed, aligned to whole days so the ETag is stable within a day"""
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (today - timedelta(days=current_app.config.get('CALENDAR_FEED_LOOKBACK_DAYS', 30)),
+            today + timedelta(days=current_app.config.get('CALENDAR_FEED_LOOKAHEAD_DAYS', 180)))
+
+def feed_etag(session, role, user_id, start, end):
+    if role == 'doctor':
+        return f"ics-{user_id}-{get_version(session, user_id)}-{start:%Y%m%d}"
+
+    # A patient's feed changes only when one of their doctors' versions does
+    rows = session.execute(
+        select(Appointment.doctor_id, DoctorVersion.version)
+        .outerjoin(DoctorVersion, DoctorVersion.doctor_id == Appointment.doctor_id)
+        .where(Appointment.patient_id == user_id, Appointment.datetime >= start,
+               Appointment.datetime < end)
+        .distinct()
+        .order_by(Appointment.doctor_id)
+    )
+    digest = hashlib.sha1(
+        ','.join(f"{doctor_id}:{version or 0}" for doctor_id, version in rows).encode()
+    ).hexdigest()[:16]
+    return f"ics-{user_id}-{digest}-{start:%Y%m%d}"
+
+def escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def line(name, value):
+    """One content line, folded at 75 octets as RFC 5545 requires"""
+    encoded = f"{name}:{value}".encode()
+    if len(encoded) <= 75:
+        return f"{name}:{value}\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1  # do not split a UTF-8 sequence
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+def stamp(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+def appointment_event(host, role, row):
+    appointment_id, when, status, notes, created_at, first_name, last_name = row
+    if role == 'doctor':
+        summary = f"Appointment: {first_name} {last_name}"
+    else:
+        summary = f"Appointment with Dr. {first_name} {last_name}"
+    lines = [
+        'BEGIN:VEVENT\r\n',
+        line('UID', f"appointment-{appointment_id}@{host}"),
+        line('DTSTAMP', stamp(created_at or when)),
+        line('DTSTART', stamp(when)),
+        line('DTEND', stamp(when + timedelta(minutes=APPOINTMENT_MINUTES))),
+        line('SUMMARY', escape(summary)),
+        line('STATUS', 'CONFIRMED' if status == 'confirmed' else 'TENTATIVE'),
+    ]
+    if notes:
+        lines.append(line('DESCRIPTION', escape(notes)))
+    lines.append('END:VEVENT\r\n')
+    return ''.join(lines)
+
+def availability_event(host, schedule, start, end):
+    """A weekly recurring event for one ``DoctorSchedule`` row, bounded by the window"""
+    first_day = start + timedelta(days=(schedule.day_of_week - start.weekday()) % 7)
+    return ''.join([
+        'BEGIN:VEVENT\r\n',
+        line('UID', f"schedule-{schedule.id}@{host}"),
+        line('DTSTAMP', stamp(start)),
+        line('DTSTART', stamp(datetime.combine(first_day.date(), schedule.start_time))),
+        line('DTEND', stamp(datetime.combine(first_day.date(), schedule.end_time))),
+        line('RRULE', f"FREQ=WEEKLY;BYDAY={WEEKDAYS[schedule.day_of_week]};UNTIL={stamp(end)}"),
+        line('SUMMARY', escape(f"Available ({schedule.slot_duration or 30}-minute slots)")),
+        line('TRANSP', 'TRANSPARENT'),
+        'END:VEVENT\r\n',
+    ])
+
+def generate_feed(session, role, user_id, host, start, end):
+    """Yield the calendar in chunks of up to BATCH_SIZE events"""
+    yield ''.join([
+        'BEGIN:VCALENDAR\r\n',
+        line('VERSION', '2.0'),
+        line('PRODID', f"-//{host}//Appointments//EN"),
+        line('CALSCALE', 'GREGORIAN'),
+        line('X-WR-CALNAME', 'Appointments'),
+        line('REFRESH-INTERVAL;VALUE=DURATION', 'PT15M'),
+    ])
+
+    if role == 'doctor':
+        schedules = session.scalars(
+            select(DoctorSchedule).where(DoctorSchedule.doctor_id == user_id)
+            .order_by(DoctorSchedule.day_of_week, DoctorSchedule.start_time)
+        ).all()
+        yield ''.join(availability_event(host, schedule, start, end) for schedule in schedules)
+        owner, counterpart = Appointment.doctor_id, Appointment.patient_id
+    else:
+        owner, counterpart = Appointment.patient_id, Appointment.doctor_id
+
+    other = aliased(User)
+    result = session.execute(
+        select(Appointment.id, Appointment.datetime, Appointment.status, Appointment.notes,
+               Appointment.created_at, other.first_name, other.last_name)
+        .join(other, counterpart == other.id)
+        .where(
+            owner == user_id,
+            Appointment.datetime >= start,
+            Appointment.datetime < end,
+            Appointment.status != 'cancelled'
+        )
+        .order_by(Appointment.datetime)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for rows in result.partitions():
+        yield ''.join(appointment_event(host, role, row) for row in rows)
+
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,86 @@
+"""Per-process cache of the logged-in user's identity.
+
+Flask-Login calls ``load_user`` on every authenticated request. Views and
+templates only read a handful of columns from ``current_user``, so the
+loader returns a detached ``Identity`` snapshot of those columns, kept for
+``IDENTITY_CACHE_TTL`` seconds (0 disables the cache).
+
+Commits that update or delete a ``User`` drop that user's snapshot on this
+worker; ``invalidate(user_id)`` does the same by hand. Other workers see
+the change once their TTL expires.
+"""
+import threading
+import time
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from models import User
+
+MAX_ENTRIES = 10000
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class Identity(UserMixin):
+    """Read-only stand-in for ``User`` on the request path"""
+
+    def __init__(self, id, email, first_name, last_name, role, specialization_id):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+        self.specialization_id = specialization_id
+
+    def __repr__(self):
+        return f'<Identity {self.id} {self.role}>'
+
+
+def fetch_identity(session, user_id):
+    row = session.execute(
+        select(User.id, User.email, User.first_name, User.last_name, User.role, User.specialization_id)
+        .where(User.id == user_id)
+    ).first()
+    return Identity(*row) if row else None
+
+def load_identity(session, user_id):
+    """The cached identity for ``user_id``, or None if there is no such user"""
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 60)
+    now = time.monotonic()
+    entry = _cache.get(user_id)
+    if entry is not None and now < entry[1]:
+        return entry[0]
+
+    identity = fetch_identity(session, user_id)
+    if identity is not None and ttl > 0:
+        with _lock:
+            if len(_cache) >= MAX_ENTRIES:
+                for key in [key for key, (_, expires_at) in _cache.items() if expires_at <= now] or list(_cache):
+                    del _cache[key]
+            _cache[user_id] = (identity, now + ttl)
+    return identity
+
+def invalidate(user_id=None):
+    """Forget one user's snapshot, or every snapshot when no id is given"""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+@event.listens_for(Session, 'after_flush')
+def _track_user_writes(session, flush_context):
+    for instance in (*session.dirty, *session.deleted):
+        if isinstance(instance, User):
+            session.info.setdefault('identity_dirty', set()).add(instance.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop('identity_dirty', ()):
+        invalidate(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('identity_dirty', None)
@@ -0,0 +1,144 @@
+"""Notification outbox.
+
+Appointment changes add a ``Notification`` row with
+``delivery_status='pending'`` in the same transaction as the change, so a
+mail is queued if and only if the change commits and no request ever
+waits on SMTP. A separate worker (``flask notifications-worker``) claims
+due rows in batches, sends each batch over a single SMTP connection and
+reschedules failures with exponential backoff until
+``NOTIFICATION_MAX_ATTEMPTS`` is reached.
+"""
+import smtplib
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import func, insert, select
+from app import db, mail
+from models import Notification, User
+
+TITLES = {
+    'pending': 'New appointment request',
+    'confirmed': 'Appointment confirmed',
+    'cancelled': 'Appointment cancelled',
+}
+
+# Failures that concern a single message; anything else is treated as the
+# connection going away and retries the rest of the batch
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def enqueue(user_id, title, message):
+    """Queue an email to ``user_id``; committed together with the caller's changes"""
+    notification = Notification(
+        user_id=user_id,
+        title=title,
+        message=message,
+        delivery_status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(notification)
+    return notification
+
+def enqueue_many(messages):
+    """Queue ``(user_id, title, message)`` emails with one multi-row INSERT"""
+    now = datetime.utcnow()
+    rows = [
+        {'user_id': user_id, 'title': title, 'message': message, 'read': False,
+         'delivery_status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+        for user_id, title, message in messages
+    ]
+    if rows:
+        db.session.execute(insert(Notification), rows)
+    return len(rows)
+
+def notify_appointment(appointment, recipient_id):
+    """Tell ``recipient_id`` about the appointment's current status"""
+    title = TITLES.get(appointment.status)
+    if title is None:
+        return None
+
+    if recipient_id == appointment.doctor_id:
+        other = f"{appointment.patient.first_name} {appointment.patient.last_name}"
+    else:
+        other = f"Dr. {appointment.doctor.first_name} {appointment.doctor.last_name}"
+    when = appointment.datetime.strftime('%A, %B %d at %I:%M %p')
+    return enqueue(recipient_id, title, f"{title}: {when} with {other}.")
+
+def retry_delay(attempts):
+    base = current_app.config.get('NOTIFICATION_RETRY_DELAY', 30)
+    return min(base * 2 ** (attempts - 1), current_app.config.get('NOTIFICATION_RETRY_MAX_DELAY', 3600))
+
+def record_failure(notification, error, now):
+    notification.attempts = (notification.attempts or 0) + 1
+    notification.last_error = str(error)[:1000]
+    if notification.attempts >= current_app.config.get('NOTIFICATION_MAX_ATTEMPTS', 5):
+        notification.delivery_status = 'failed'
+    else:
+        notification.next_attempt_at = now + timedelta(seconds=retry_delay(notification.attempts))
+
+def claim_batch(batch_size, now):
+    """Lock up to ``batch_size`` due rows; concurrent workers skip each other's rows"""
+    return db.session.execute(
+        select(Notification, User.email)
+        .join(User, Notification.user_id == User.id)
+        .where(Notification.delivery_status == 'pending', Notification.next_attempt_at <= now)
+        .order_by(Notification.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True, of=Notification)
+    ).all()
+
+def deliver_batch(batch_size=None):
+    """Send one batch of due notifications and return how many rows were handled"""
+    batch_size = batch_size or current_app.config.get('NOTIFICATION_BATCH_SIZE', 100)
+    now = datetime.utcnow()
+    rows = claim_batch(batch_size, now)
+    if not rows:
+        db.session.commit()
+        return 0
+
+    sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+    remaining = [notification for notification, _ in rows]
+    try:
+        with mail.connect() as connection:
+            for notification, email in rows:
+                try:
+                    connection.send(Message(subject=notification.title, recipients=[email],
+                                            body=notification.message, sender=sender))
+                    notification.delivery_status = 'sent'
+                    notification.sent_at = datetime.utcnow()
+                    notification.last_error = None
+                except MESSAGE_ERRORS as e:
+                    record_failure(notification, e, now)
+                remaining.remove(notification)
+    except (smtplib.SMTPException, OSError) as e:
+        print(f"Error connecting to SMTP, retrying {len(remaining)} notifications later: {str(e)}")
+        for notification in remaining:
+            record_failure(notification, e, now)
+
+    db.session.commit()
+    return len(rows)
+
+def pending_count():
+    return db.session.scalar(
+        select(func.count()).select_from(Notification).where(Notification.delivery_status == 'pending')
+    )
+
+def run_worker(once=False, poll_interval=None):
+    """Drain the outbox until interrupted; full batches are followed immediately by the next"""
+    poll_interval = poll_interval or current_app.config.get('NOTIFICATION_POLL_INTERVAL', 5)
+    batch_size = current_app.config.get('NOTIFICATION_BATCH_SIZE', 100)
+    total = 0
+    while True:
+        try:
+            handled = deliver_batch(batch_size)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error delivering notifications: {str(e)}")
+            handled = 0
+        total += handled
+        if once and handled < batch_size:
+            return total
+        if handled < batch_size:
+            time.sleep(poll_interval)
@@ -0,0 +1,68 @@
+"""Password hashing on a bounded process pool.
+
+Key stretching is deliberately CPU-heavy. Running it in the request thread
+lets a burst of logins pin every worker, so hashes are computed on a pool
+of ``PASSWORD_HASH_WORKERS`` processes (defaults to the number of cores;
+0 hashes inline). ``PASSWORD_HASH_METHOD`` is any werkzeug method string,
+e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashes made with
+other parameters still verify and are re-hashed on the next login, see
+``User.check_password``. When the pool cannot finish a hash within
+``PASSWORD_HASH_TIMEOUT`` seconds, ``PasswordHashBusy`` is raised so views
+can ask the user to retry instead of failing with a 500.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+_executor = None
+_executor_lock = threading.Lock()
+_method_prefixes = {}
+
+
+class PasswordHashBusy(Exception):
+    """The hashing pool is saturated; the request can be retried shortly"""
+    pass
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+            # spawn: never fork a process that is already running request threads
+            _executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+def run(fn, *args):
+    if current_app.config.get('PASSWORD_HASH_WORKERS') == 0:
+        return fn(*args)
+    future = get_executor().submit(fn, *args)
+    try:
+        return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 30))
+    except FutureTimeoutError:
+        future.cancel()  # drop it if it is still queued behind the burst
+        raise PasswordHashBusy('Password hashing is busy, try again shortly')
+
+def configured_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD
+
+def method_prefix(method):
+    """The ``method:params`` prefix werkzeug writes for ``method``, defaults filled in"""
+    if method not in _method_prefixes:
+        _method_prefixes[method] = generate_password_hash('', method, salt_length=1).split('$', 1)[0]
+    return _method_prefixes[method]
+
+def hash_password(password):
+    return run(generate_password_hash, password, configured_method())
+
+def verify_password(password_hash, password):
+    return run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """True when ``password_hash`` was made with other parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != method_prefix(configured_method())
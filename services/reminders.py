@@ -0,0 +1,102 @@
+"""Appointment reminders 24 hours and 1 hour ahead.
+
+Each tick scans, per reminder kind, only the confirmed appointments that
+moved into the window since the previous tick:
+
+    (last_datetime, last_appointment_id) < (datetime, id) < (now + offset, 0)
+
+which is a keyset range on ``ix_appointment_datetime_id``. The high-water
+mark is stored in ``reminder_cursor`` and advanced in the same transaction
+that queues the reminders in the notification outbox, so a row is never
+scanned twice, even across restarts, and per-tick cost depends on how many
+appointments start in that slice of time, not on the size of the table.
+
+An appointment confirmed after its window has been scanned gets only the
+later reminder. On first run the cursor starts at the current time.
+"""
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, tuple_
+from app import db
+from models import Appointment, ReminderCursor, User
+from services.notifications import enqueue_many
+
+REMINDERS = [
+    ('24h', timedelta(hours=24), 'tomorrow'),
+    ('1h', timedelta(hours=1), 'in one hour'),
+]
+
+
+def get_cursor(kind, now):
+    """Lock this kind's cursor so concurrent schedulers take turns"""
+    cursor = db.session.execute(
+        select(ReminderCursor).where(ReminderCursor.kind == kind).with_for_update()
+    ).scalar_one_or_none()
+    if cursor is None:
+        cursor = ReminderCursor(kind=kind, last_datetime=now, last_appointment_id=0)
+        db.session.add(cursor)
+        db.session.flush()
+    return cursor
+
+def scan_batch(kind, offset, label, now, batch_size):
+    """Queue reminders for the next batch in the window; returns (queued, drained)"""
+    cursor = get_cursor(kind, now)
+    horizon = now + offset
+
+    rows = db.session.execute(
+        select(Appointment.id, Appointment.datetime, Appointment.status,
+               Appointment.patient_id, User.first_name, User.last_name)
+        .join(User, Appointment.doctor_id == User.id)
+        .where(
+            tuple_(Appointment.datetime, Appointment.id)
+            > (cursor.last_datetime, cursor.last_appointment_id),
+            Appointment.datetime < horizon
+        )
+        .order_by(Appointment.datetime, Appointment.id)
+        .limit(batch_size)
+    ).all()
+
+    messages = [
+        (row.patient_id, 'Appointment reminder',
+         f"Reminder: your appointment with Dr. {row.first_name} {row.last_name} is {label}, "
+         f"{row.datetime.strftime('%A, %B %d at %I:%M %p')}.")
+        for row in rows if row.status == 'confirmed'
+    ]
+    queued = enqueue_many(messages)
+
+    drained = len(rows) < batch_size
+    if drained:
+        cursor.last_datetime, cursor.last_appointment_id = horizon, 0
+    else:
+        cursor.last_datetime, cursor.last_appointment_id = rows[-1].datetime, rows[-1].id
+    db.session.commit()
+    return queued, drained
+
+def tick(now=None, batch_size=None):
+    """Run every reminder kind up to ``now``; returns reminders queued per kind"""
+    now = now or datetime.utcnow()
+    batch_size = batch_size or current_app.config.get('REMINDER_BATCH_SIZE', 500)
+    queued = {}
+    for kind, offset, label in REMINDERS:
+        queued[kind] = 0
+        drained = False
+        while not drained:
+            count, drained = scan_batch(kind, offset, label, now, batch_size)
+            queued[kind] += count
+    return queued
+
+def run_scheduler(once=False, interval=None):
+    interval = interval or current_app.config.get('REMINDER_INTERVAL', 60)
+    while True:
+        started = time.monotonic()
+        try:
+            queued = tick()
+            if any(queued.values()):
+                print(f"Queued reminders: {queued}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error scheduling reminders: {str(e)}")
+        if once:
+            return
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,190 @@
+"""Optional materialized availability store.
+
+When ``AVAILABILITY_MATERIALIZED`` is enabled, free slots are kept in
+``AvailabilitySlot`` rows (one per doctor per day) and reads become a
+single indexed lookup. Writes that change availability call the hooks
+below before committing; the affected days are remembered on the session
+and recomputed in a separate short transaction once the change commits,
+so a booking never waits on, or fails because of, a store row.
+``flask rebuild-availability`` repairs any drift.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+from app import db
+from models import AvailabilitySlot, User
+from services import availability, doctor_versions
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled():
+    return current_app.config.get('AVAILABILITY_MATERIALIZED', False)
+
+def horizon_dates(start_date=None):
+    """Dates covered by the store, starting today"""
+    start_date = start_date or datetime.utcnow().date()
+    days = current_app.config.get('AVAILABILITY_HORIZON_DAYS', 14)
+    return [start_date + timedelta(days=offset) for offset in range(days + 1)]
+
+def insert_missing(session, doctor_ids, dates):
+    """Create empty rows for any missing (doctor_id, date), ignoring ones that already exist"""
+    values = [{'doctor_id': doctor_id, 'date': date, 'free_minutes': ''}
+              for doctor_id in doctor_ids for date in dates]
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        session.execute(upsert(AvailabilitySlot).values(values)
+                        .on_conflict_do_nothing(index_elements=['doctor_id', 'date']))
+        return
+
+    existing = set(session.execute(
+        select(AvailabilitySlot.doctor_id, AvailabilitySlot.date).where(
+            AvailabilitySlot.doctor_id.in_(doctor_ids), AvailabilitySlot.date.in_(dates)
+        )
+    ).all())
+    missing = [row for row in values if (row['doctor_id'], row['date']) not in existing]
+    if missing:
+        session.execute(insert(AvailabilitySlot).values(missing))
+
+def refresh_days(session, doctor_ids, dates):
+    """Recompute the stored slots for the given doctors and dates.
+
+    The rows are created if needed and locked before the bookings are
+    read, so concurrent refreshes of the same doctor and day run one after
+    the other and each sees every booking committed before it. Does not
+    commit. Returns the refreshed rows keyed by (doctor_id, date).
+    """
+    doctor_ids = sorted(set(doctor_ids))
+    dates = sorted(set(dates))
+    if not doctor_ids or not dates:
+        return {}
+
+    insert_missing(session, doctor_ids, dates)
+    rows = {
+        (row.doctor_id, row.date): row
+        for row in session.scalars(
+            select(AvailabilitySlot).where(
+                AvailabilitySlot.doctor_id.in_(doctor_ids),
+                AvailabilitySlot.date.in_(dates)
+            ).order_by(AvailabilitySlot.doctor_id, AvailabilitySlot.date)  # fixed lock order
+            .with_for_update()
+        )
+    }
+
+    computed = availability.get_available_slots_by_doctor(doctor_ids, dates[0], dates[-1], session=session)
+    for doctor_id in doctor_ids:
+        slots_by_date = {}
+        for slot in computed.get(doctor_id, []):
+            slots_by_date.setdefault(slot.date(), []).append(slot)
+        for date in dates:
+            rows[(doctor_id, date)].set_slots(slots_by_date.get(date, []))
+
+    return rows
+
+def mark_changed(doctor_id, dates):
+    db.session.info.setdefault('availability_dirty', defaultdict(set))[doctor_id].update(dates)
+
+def schedule_changed(doctor_id, day_of_week):
+    """Hook for schedule inserts and deletes"""
+    if not is_enabled():
+        return
+    mark_changed(doctor_id, [date for date in horizon_dates() if date.weekday() == day_of_week])
+
+def appointment_changed(appointment):
+    """Hook for appointment status changes"""
+    if not is_enabled():
+        return
+    mark_changed(appointment.doctor_id, [appointment.datetime.date()])
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_after_commit(session):
+    changed = session.info.pop('availability_dirty', None)
+    if not changed:
+        return
+    try:
+        with Session(session.get_bind()) as refresh_session:
+            for doctor_id in sorted(changed):
+                refresh_days(refresh_session, [doctor_id], changed[doctor_id])
+            # An ETag handed out between the change and this refresh described the old rows
+            doctor_versions.bump(refresh_session.connection(), changed)
+            refresh_session.commit()
+    except Exception:
+        # The change itself is committed; rebuild-availability repairs the store
+        logger.exception('Could not refresh availability for doctors %s', sorted(changed))
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_days(session):
+    session.info.pop('availability_dirty', None)
+
+def get_available_slots_by_doctor(doctor_ids, start_date, end_date, not_before=None):
+    """Serve free slots from the store.
+
+    Doctors with a day missing from the store are computed on the fly
+    instead; reads never write, missing days are filled by the write
+    hooks and ``flask rebuild-availability``. Falls back to the on-the-fly
+    availability engine entirely when the store is disabled.
+    """
+    if not is_enabled():
+        return availability.get_available_slots_by_doctor(
+            doctor_ids, start_date, end_date, not_before=not_before
+        )
+
+    doctor_ids = list(doctor_ids)
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    if not doctor_ids or not dates:
+        return {doctor_id: [] for doctor_id in doctor_ids}
+
+    rows = {
+        (row.doctor_id, row.date): row
+        for row in AvailabilitySlot.query.filter(
+            AvailabilitySlot.doctor_id.in_(doctor_ids),
+            AvailabilitySlot.date >= start_date,
+            AvailabilitySlot.date <= end_date
+        ).all()
+    }
+
+    missing = {doctor_id for doctor_id in doctor_ids for date in dates if (doctor_id, date) not in rows}
+    available = {}
+    if missing:
+        available = availability.get_available_slots_by_doctor(
+            missing, start_date, end_date, not_before=not_before
+        )
+
+    for doctor_id in doctor_ids:
+        if doctor_id in missing:
+            available.setdefault(doctor_id, [])
+            continue
+        slots = []
+        for date in dates:
+            slots.extend(rows[(doctor_id, date)].get_slots())
+        if not_before is not None:
+            slots = [slot for slot in slots if slot > not_before]
+        available[doctor_id] = slots
+    return available
+
+def get_available_slots(doctor_id, start_date, end_date, not_before=None):
+    return get_available_slots_by_doctor(
+        [doctor_id], start_date, end_date, not_before=not_before
+    ).get(doctor_id, [])
+
+def rebuild(batch_size=500):
+    """Drop expired rows and recompute every doctor's horizon from scratch"""
+    today = datetime.utcnow().date()
+    AvailabilitySlot.query.filter(AvailabilitySlot.date < today).delete(synchronize_session=False)
+    db.session.commit()
+
+    doctor_ids = [row.id for row in User.query.with_entities(User.id).filter_by(role='doctor').all()]
+    dates = horizon_dates(today)
+
+    total = 0
+    for offset in range(0, len(doctor_ids), batch_size):
+        total += len(refresh_days(db.session, doctor_ids[offset:offset + batch_size], dates))
+        db.session.commit()
+    return total
@@ -0,0 +1,84 @@
+"""Cached aggregate counts for the admin dashboard.
+
+All counts come from a single UNION ALL of two GROUP BY queries and are
+cached in process for ``STATS_CACHE_TTL`` seconds. Commits that insert or
+delete a ``User`` or ``Appointment``, or change a user's role or an
+appointment's status, drop this worker's cached copy straight away; other
+writes (a password re-hash on login, a rescheduled time) leave it alone.
+Other workers pick up the change when their TTL expires.
+"""
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, func, inspect, literal, select
+from sqlalchemy.orm import Session
+from models import Appointment, User
+
+# The only columns the aggregates group by
+COUNTED_COLUMNS = {User: 'role', Appointment: 'status'}
+
+_cache = {'value': None, 'expires_at': 0.0}
+_lock = threading.Lock()
+
+
+def compute_stats(session):
+    users = select(
+        literal('role').label('kind'), User.role.label('key'), func.count().label('total')
+    ).group_by(User.role)
+    appointments = select(
+        literal('status').label('kind'), Appointment.status.label('key'), func.count().label('total')
+    ).group_by(Appointment.status)
+
+    roles = {}
+    statuses = {}
+    for kind, key, total in session.execute(users.union_all(appointments)):
+        (roles if kind == 'role' else statuses)[key or 'unknown'] = total
+
+    return {
+        'total_doctors': roles.get('doctor', 0),
+        'total_patients': roles.get('patient', 0),
+        'total_admins': roles.get('admin', 0),
+        'total_appointments': sum(statuses.values()),
+        'appointments_by_status': statuses,
+    }
+
+def get_dashboard_stats(session):
+    """Return the cached stats, recomputing them once the TTL has expired"""
+    now = time.monotonic()
+    value = _cache['value']
+    if value is not None and now < _cache['expires_at']:
+        return value
+
+    with _lock:
+        if _cache['value'] is not None and time.monotonic() < _cache['expires_at']:
+            return _cache['value']
+        value = compute_stats(session)
+        _cache['value'] = value
+        _cache['expires_at'] = time.monotonic() + current_app.config.get('STATS_CACHE_TTL', 60)
+    return value
+
+def invalidate():
+    with _lock:
+        _cache['value'] = None
+        _cache['expires_at'] = 0.0
+
+@event.listens_for(Session, 'after_flush')
+def _track_counted_writes(session, flush_context):
+    for instance in (*session.new, *session.deleted):
+        if type(instance) in COUNTED_COLUMNS:
+            session.info['stats_dirty'] = True
+            return
+    for instance in session.dirty:
+        column = COUNTED_COLUMNS.get(type(instance))
+        if column and inspect(instance).attrs[column].history.has_changes():
+            session.info['stats_dirty'] = True
+            return
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('stats_dirty', False):
+        invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('stats_dirty', None)
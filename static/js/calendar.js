@@ -1,6 +1,15 @@
+// Dashboard calendar. Events are fetched from the server one visible window
+// at a time (see services/calendar_feed.py); FullCalendar only asks again
+// when the user navigates outside the range it already holds.
 document.addEventListener('DOMContentLoaded', function() {
     const calendarEl = document.getElementById('calendar');
-    if (!calendarEl) return;
+    if (!calendarEl || !calendarEl.dataset.eventsUrl) return;
+
+    const STATUS_COLORS = {
+        confirmed: '#198754',
+        pending: '#ffc107',
+        cancelled: '#dc3545'
+    };
 
     const calendar = new FullCalendar.Calendar(calendarEl, {
         initialView: 'dayGridMonth',
@@ -9,26 +18,19 @@ document.addEventListener('DOMContentLoaded', function() {
             center: 'title',
             right: 'dayGridMonth,timeGridWeek,timeGridDay'
         },
-        selectable: true,
-        selectMirror: true,
-        select: function(arg) {
-            const title = prompt('Enter appointment details:');
-            if (title) {
-                calendar.addEvent({
-                    title: title,
-                    start: arg.start,
-                    end: arg.end,
-                    allDay: arg.allDay
-                });
-            }
-            calendar.unselect();
+        // Appointment times are stored and served as UTC wall-clock times
+        timeZone: 'UTC',
+        events: calendarEl.dataset.eventsUrl,
+        lazyFetching: true,
+        defaultTimedEventDuration: '00:30',
+        eventDataTransform: function(event) {
+            event.color = STATUS_COLORS[event.status] || '#6c757d';
+            event.extendedProps = { status: event.status };
+            return event;
         },
-        eventClick: function(arg) {
-            if (confirm('Are you sure you want to delete this event?')) {
-                arg.event.remove();
-            }
+        eventDidMount: function(arg) {
+            arg.el.title = `${arg.event.title} (${arg.event.extendedProps.status})`;
         },
-        editable: true,
         dayMaxEvents: true
     });
 
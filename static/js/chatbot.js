@@ -95,9 +95,9 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Handle the response similar to text messages
                 if (data.message) {
                     addMessage(data.message, false, data.options);
-                    // Play the synthesized response if available
-                    if (data.audio_response) {
-                        playAudioResponse(data.audio_response);
+                    // Play the synthesized response once it is ready
+                    if (data.audio_url) {
+                        playAudioResponse(data.audio_url);
                     }
                 }
 
@@ -172,9 +172,9 @@ document.addEventListener('DOMContentLoaded', function() {
             // Handle different response types
             if (data.message) {
                 addMessage(data.message, false, data.options);
-                // Play audio response if available
-                if (data.audio_response) {
-                    playAudioResponse(data.audio_response);
+                // Play audio response once it is ready
+                if (data.audio_url) {
+                    playAudioResponse(data.audio_url);
                 }
             }
 
@@ -205,10 +205,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // Play audio response from the server
-    async function playAudioResponse(audioData) {
+    // Play the audio response; the browser streams it from the audio endpoint
+    async function playAudioResponse(audioUrl) {
         try {
-            const audio = new Audio(`data:audio/wav;base64,${audioData}`);
+            const audio = new Audio(audioUrl);
             await audio.play();
         } catch (error) {
             console.error('Error playing audio response:', error);
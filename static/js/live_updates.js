@@ -0,0 +1,119 @@
+// Live appointment updates over Server-Sent Events (see routes/events.py).
+// Counts marked with data-live-count and rows marked with data-appointment-id
+// are updated in place, so dashboards no longer need a reload. When the
+// worker is at its stream cap it answers 503, which EventSource does not
+// retry; the stream is then reopened with a jittered, growing backoff.
+(function() {
+    const script = document.currentScript;
+    if (!script || !window.EventSource) return;
+
+    const STATUS_CLASSES = {
+        confirmed: 'bg-success',
+        pending: 'bg-warning',
+        cancelled: 'bg-danger'
+    };
+
+    function showAlert(text) {
+        const container = document.querySelector('[data-live-alerts]');
+        if (!container) return;
+
+        const alert = document.createElement('div');
+        alert.className = 'alert alert-info alert-dismissible fade show';
+        alert.textContent = text + ' ';
+
+        const reload = document.createElement('a');
+        reload.href = window.location.href;
+        reload.className = 'alert-link';
+        reload.textContent = 'Refresh';
+        alert.appendChild(reload);
+
+        const close = document.createElement('button');
+        close.type = 'button';
+        close.className = 'btn-close';
+        close.setAttribute('data-bs-dismiss', 'alert');
+        alert.appendChild(close);
+
+        container.appendChild(alert);
+    }
+
+    function updateAppointment(appointment) {
+        document.querySelectorAll(`[data-appointment-id="${appointment.id}"]`).forEach(function(row) {
+            if (appointment.status !== 'pending' && row.classList.contains('pending-item')) {
+                row.remove();
+                return;
+            }
+
+            const badge = row.querySelector('.appointment-status');
+            if (badge) {
+                Object.values(STATUS_CLASSES).forEach(cls => badge.classList.remove(cls));
+                badge.classList.add(STATUS_CLASSES[appointment.status] || 'bg-secondary');
+                badge.textContent = appointment.status;
+            }
+            if (appointment.status !== 'pending') {
+                row.querySelectorAll('.appointment-actions').forEach(function(actions) {
+                    if (appointment.status === 'cancelled' || actions.classList.contains('btn-group')) {
+                        actions.remove();
+                    }
+                });
+            }
+        });
+    }
+
+    const MIN_RETRY_MS = 15000;
+    const MAX_RETRY_MS = 300000;
+    let source = null;
+    let retryMs = MIN_RETRY_MS;
+    let retryTimer = null;
+
+    function onCounts(event) {
+        const counts = JSON.parse(event.data);
+        Object.keys(counts).forEach(function(name) {
+            document.querySelectorAll(`[data-live-count="${name}"]`).forEach(function(el) {
+                el.textContent = counts[name];
+            });
+        });
+    }
+
+    function onAppointment(event) {
+        const appointment = JSON.parse(event.data);
+        const when = appointment.datetime.replace('T', ' ');
+
+        if (appointment.type === 'created') {
+            if (!document.querySelector(`[data-appointment-id="${appointment.id}"]`)) {
+                showAlert(`New appointment request for ${when}.`);
+            }
+            return;
+        }
+        updateAppointment(appointment);
+    }
+
+    function connect() {
+        retryTimer = null;
+        source = new EventSource(script.dataset.eventsUrl);
+        source.addEventListener('open', function() {
+            retryMs = MIN_RETRY_MS;
+        });
+        source.addEventListener('counts', onCounts);
+        source.addEventListener('appointment', onAppointment);
+        source.addEventListener('error', function() {
+            // Network drops are retried by EventSource itself (readyState CONNECTING);
+            // a refused stream (e.g. 503 at the cap) is CLOSED and needs us.
+            if (source.readyState !== EventSource.CLOSED || retryTimer) return;
+            const delay = retryMs / 2 + Math.random() * retryMs / 2;
+            retryMs = Math.min(retryMs * 2, MAX_RETRY_MS);
+            retryTimer = setTimeout(connect, delay);
+        });
+    }
+
+    connect();
+
+    // pagehide also fires for bfcache navigations, where beforeunload does not
+    window.addEventListener('pagehide', function() {
+        clearTimeout(retryTimer);
+        retryTimer = -1;  // do not reconnect while the page goes away
+        source.close();
+    });
+    window.addEventListener('pageshow', function(event) {
+        if (event.persisted) connect();  // restored from bfcache
+    });
+})();
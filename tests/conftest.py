@@ -0,0 +1,47 @@
+import pytest
+from app import create_app, db
+from models import User
+from services import doctor_directory, stats
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'METRICS_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_HASH_WORKERS': 0,
+        'IDENTITY_CACHE_TTL': 0,
+        'STATS_CACHE_TTL': 0,
+        'CALENDAR_CACHE_TTL': 0,
+    })
+    with app.app_context():
+        from migrations.runner import upgrade
+        upgrade()
+        doctor_directory.bump()  # drop a snapshot left by an earlier test's database
+        stats.invalidate()
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user(app):
+    def make_user(role, email=None, **fields):
+        user = User(email=email or f'{role}{User.query.count()}@example.com',
+                    first_name=role.title(), last_name='Test', role=role, **fields)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
@@ -0,0 +1,34 @@
+import re
+from datetime import datetime, timedelta
+from app import db
+from models import Appointment
+from routes import admin
+from conftest import login
+
+
+def test_cursor_round_trips_microseconds():
+    appointment = Appointment(id=7, datetime=datetime(2030, 1, 1, 9, 0, 0, 123456))
+    assert admin.decode_cursor(admin.encode_cursor(appointment)) == (appointment.datetime, 7)
+
+def test_pages_keep_sub_second_rows_at_the_boundary(client, make_user, monkeypatch):
+    monkeypatch.setattr(admin, 'APPOINTMENTS_PAGE_SIZE', 2)
+    doctor = make_user('doctor')
+    patient = make_user('patient')
+    base = datetime(2030, 1, 1, 9, 0, 0)
+    db.session.add_all([
+        Appointment(doctor_id=doctor.id, patient_id=patient.id,
+                    datetime=base + timedelta(microseconds=1000 * index), notes=f'note-{index}')
+        for index in range(5)
+    ])
+    db.session.commit()
+    login(client, make_user('admin'))
+
+    seen = []
+    url = '/admin/appointments'
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        seen.extend(re.findall(r'note-\d', html))
+        next_page = re.search(r'href="([^"]*after=[^"]*)"', html)
+        url = next_page.group(1).replace('&amp;', '&') if next_page else None
+
+    assert seen == [f'note-{index}' for index in reversed(range(5))]
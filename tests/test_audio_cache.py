@@ -0,0 +1,20 @@
+import os
+import time
+from services.audio_cache import TEMP_GRACE_SECONDS, AudioCache
+
+
+def test_eviction_keeps_fresh_temp_files(tmp_path):
+    cache = AudioCache(str(tmp_path), disk_bytes=0, evict_every=1000)
+    cache.set('ab' + '0' * 62, b'audio')
+    in_flight = tmp_path / 'ab' / '.tmp-writing'
+    in_flight.write_bytes(b'partial')
+    abandoned = tmp_path / 'ab' / '.tmp-abandoned'
+    abandoned.write_bytes(b'partial')
+    old = time.time() - TEMP_GRACE_SECONDS - 1
+    os.utime(abandoned, (old, old))
+
+    cache.evict_disk()
+
+    assert in_flight.exists()
+    assert not abandoned.exists()
+    assert not (tmp_path / 'ab' / ('ab' + '0' * 62)).exists()
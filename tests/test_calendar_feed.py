@@ -0,0 +1,31 @@
+from services.ics_feed import _serializer, make_token
+from app import db
+from conftest import login
+
+
+def test_feed_link_serves_calendar(client, make_user):
+    patient = make_user('patient')
+    response = client.get(f'/calendar/{make_token(db.session, patient.id)}.ics')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).startswith('BEGIN:VCALENDAR')
+
+def test_reset_revokes_old_link(client, make_user):
+    doctor = make_user('doctor')
+    old_token = make_token(db.session, doctor.id)
+    login(client, doctor)
+
+    assert client.post('/calendar/reset').status_code == 302
+
+    new_token = make_token(db.session, doctor.id)
+    assert new_token != old_token
+    assert client.get(f'/calendar/{old_token}.ics').status_code == 404
+    assert client.get(f'/calendar/{new_token}.ics').status_code == 200
+
+def test_tampered_link_is_not_found(client, make_user):
+    patient = make_user('patient')
+    token = make_token(db.session, patient.id)
+    assert client.get(f'/calendar/{token[:-2]}xx.ics').status_code == 404
+
+def test_unversioned_token_is_rejected(client, make_user):
+    patient = make_user('patient')
+    assert client.get(f'/calendar/{_serializer().dumps(patient.id)}.ics').status_code == 404
@@ -0,0 +1,50 @@
+import threading
+import pytest
+from routes import chat
+from services.audio_cache import AudioCache
+
+
+@pytest.fixture
+def audio_cache(app, tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path / 'tts'))
+    monkeypatch.setattr(chat, '_audio_cache', cache)
+    return cache
+
+class FakeSpeech:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+class FakeClient:
+    def __init__(self):
+        self.audio = self
+        self.speech = self
+
+    def create(self, **kwargs):
+        return FakeSpeech(b'mp3-bytes')
+
+def test_audio_pending_on_another_worker_is_awaited(client, audio_cache):
+    key = 'cd' + '1' * 62
+    audio_cache.mark_pending(key)
+    # Another worker on the host finishes writing shortly after the request arrives
+    writer = threading.Timer(0.2, lambda: (audio_cache.set(key, b'mp3'), audio_cache.clear_pending(key)))
+    writer.start()
+
+    response = client.get(f'/api/chat/audio/{key}')
+    writer.join()
+
+    assert response.status_code == 200
+    assert response.data == b'mp3'
+
+def test_unknown_audio_is_not_found(client, audio_cache):
+    assert client.get(f"/api/chat/audio/{'ef' * 32}").status_code == 404
+
+def test_speech_is_returned_when_caching_fails(audio_cache, monkeypatch):
+    def broken_set(key, data):
+        raise OSError('disk full')
+    monkeypatch.setattr(audio_cache, 'set', broken_set)
+
+    assert chat.generate_speech('hello', FakeClient(), audio_cache) == b'mp3-bytes'
+    assert not audio_cache.is_pending(chat.audio_key(chat.TTS_MODEL, chat.TTS_VOICE, 'hello'))
@@ -0,0 +1,34 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import pytest
+from routes import chat
+
+
+@pytest.fixture
+def one_upstream_worker(app, monkeypatch):
+    monkeypatch.setattr(chat, '_executors', {})
+    app.config.update(CHAT_UPSTREAM_WORKERS=1, CHAT_TTS_WORKERS=1)
+    release = threading.Event()
+    yield release
+    release.set()
+    for executor in chat._executors.values():
+        executor.shutdown(wait=True)
+
+def test_timed_out_call_is_dropped_from_the_queue(one_upstream_worker):
+    release = one_upstream_worker
+    chat.get_executor().submit(release.wait)
+    ran = []
+
+    with pytest.raises(FutureTimeoutError):
+        chat.run_upstream(ran.append, 'late', timeout=0.01)
+    release.set()
+    chat.get_executor().shutdown(wait=True)
+
+    assert ran == []
+
+def test_speech_has_its_own_pool(one_upstream_worker):
+    release = one_upstream_worker
+    chat.get_executor().submit(release.wait)
+
+    assert chat.get_executor('tts') is not chat.get_executor()
+    assert chat.get_executor('tts').submit(lambda: 'spoken').result(timeout=1) == 'spoken'
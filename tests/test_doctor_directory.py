@@ -0,0 +1,18 @@
+from sqlalchemy import update
+from app import db
+from models import CacheVersion
+from services import doctor_directory
+
+
+def test_sees_doctors_added_by_another_worker(app, make_user):
+    app.config['DOCTOR_DIRECTORY_CHECK_INTERVAL'] = 0
+    make_user('doctor')
+    assert len(doctor_directory.get_doctors(db.session)) == 1
+
+    # Another worker commits a doctor and bumps the shared version
+    make_user('doctor')
+    assert len(doctor_directory.get_doctors(db.session)) == 1
+    db.session.execute(update(CacheVersion).values(version=CacheVersion.version + 1))
+    db.session.commit()
+
+    assert len(doctor_directory.get_doctors(db.session)) == 2
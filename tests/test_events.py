@@ -0,0 +1,20 @@
+from conftest import login
+
+
+def test_stream_over_the_cap_is_refused_with_retry_after(app, client, make_user):
+    app.config['EVENTS_MAX_STREAMS'] = 0
+    login(client, make_user('doctor'))
+
+    response = client.get('/events')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+def test_stream_is_only_for_doctors_and_patients(client, make_user):
+    login(client, make_user('admin'))
+    assert client.get('/events').status_code == 403
+
+def test_live_updates_load_only_on_dashboards(client, make_user):
+    login(client, make_user('patient'))
+    assert b'live_updates.js' in client.get('/patient/dashboard').data
+    assert b'live_updates.js' not in client.get('/patient/book_appointment').data
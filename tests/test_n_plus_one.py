@@ -0,0 +1,12 @@
+import pytest
+from perf.n_plus_one import PAGES, measure
+
+
+@pytest.fixture(scope='module')
+def statement_counts():
+    return measure(3), measure(15)
+
+@pytest.mark.parametrize('url', [url for _, url in PAGES])
+def test_statement_count_does_not_grow_with_rows(statement_counts, url):
+    small, large = statement_counts
+    assert large[url] <= small[url], f'{url}: {small[url]} statements with 3 rows, {large[url]} with 15'
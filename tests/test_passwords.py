@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services import passwords
+
+
+@pytest.fixture
+def saturate_pool(app, monkeypatch):
+    """Replace the pool with one thread kept busy far longer than the hash timeout"""
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def saturate():
+        executor.submit(time.sleep, 0.5)
+        monkeypatch.setattr(passwords, '_executor', executor)
+        app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=0.01)
+
+    yield saturate
+    executor.shutdown(wait=True, cancel_futures=True)
+
+def test_run_raises_busy_when_pool_is_saturated(saturate_pool):
+    saturate_pool()
+    with pytest.raises(passwords.PasswordHashBusy):
+        passwords.hash_password('secret')
+
+def test_login_answers_503_when_pool_is_saturated(client, make_user, saturate_pool):
+    user = make_user('patient')
+    saturate_pool()
+    response = client.post('/login', data={'email': user.email, 'password': 'password'})
+    assert response.status_code == 503
+    assert b'busy' in response.data
+
+def test_register_answers_503_when_pool_is_saturated(client, saturate_pool):
+    saturate_pool()
+    response = client.post('/register', data={
+        'email': 'new@example.com', 'password': 'secret',
+        'first_name': 'New', 'last_name': 'Patient', 'role': 'patient',
+    })
+    assert response.status_code == 503
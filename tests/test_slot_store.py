@@ -0,0 +1,49 @@
+from datetime import datetime, time, timedelta
+import pytest
+from app import db
+from models import AvailabilitySlot, DoctorSchedule
+from services import slot_store
+from services.booking import SlotTakenError, book_appointment
+
+
+@pytest.fixture
+def doctor_with_schedule(app, make_user):
+    app.config['AVAILABILITY_MATERIALIZED'] = True
+    doctor = make_user('doctor')
+    day = datetime.utcnow().date() + timedelta(days=7)
+    db.session.add(DoctorSchedule(doctor_id=doctor.id, day_of_week=day.weekday(),
+                                  start_time=time(9), end_time=time(10)))
+    slot_store.schedule_changed(doctor.id, day.weekday())
+    db.session.commit()
+    return doctor, day
+
+def stored_slots(doctor_id, day):
+    db.session.expire_all()
+    return AvailabilitySlot.query.filter_by(doctor_id=doctor_id, date=day).one().get_slots()
+
+def test_schedule_and_booking_refresh_the_store_after_commit(doctor_with_schedule, make_user):
+    doctor, day = doctor_with_schedule
+    nine, half_past = datetime.combine(day, time(9)), datetime.combine(day, time(9, 30))
+    assert stored_slots(doctor.id, day) == [nine, half_past]
+
+    book_appointment(doctor.id, make_user('patient').id, nine)
+    assert stored_slots(doctor.id, day) == [half_past]
+
+def test_only_the_active_slot_index_counts_as_taken(doctor_with_schedule, make_user):
+    doctor, day = doctor_with_schedule
+    nine = datetime.combine(day, time(9))
+    book_appointment(doctor.id, make_user('patient').id, nine)
+
+    with pytest.raises(SlotTakenError):
+        book_appointment(doctor.id, make_user('patient').id, nine)
+    assert stored_slots(doctor.id, day) == [datetime.combine(day, time(9, 30))]
+
+def test_other_integrity_errors_are_not_slot_conflicts(app, make_user):
+    from sqlalchemy.exc import IntegrityError
+    from services.booking import is_slot_conflict
+
+    user = make_user('patient')
+    with pytest.raises(IntegrityError) as caught:
+        make_user('patient', email=user.email)
+    db.session.rollback()
+    assert not is_slot_conflict(caught.value)
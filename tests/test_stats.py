@@ -0,0 +1,37 @@
+from datetime import datetime
+from app import db
+from models import Appointment
+from services import stats
+
+
+def cached():
+    return stats._cache['value'] is not None
+
+def test_password_rehash_keeps_the_cache(app, make_user):
+    app.config['STATS_CACHE_TTL'] = 60
+    user = make_user('patient')
+    stats.get_dashboard_stats(db.session)
+
+    user.password_hash = 'rehashed'
+    db.session.commit()
+    assert cached()
+
+    user.role = 'doctor'
+    db.session.commit()
+    assert not cached()
+
+def test_appointment_status_change_drops_the_cache(app, make_user):
+    app.config['STATS_CACHE_TTL'] = 60
+    appointment = Appointment(doctor_id=make_user('doctor').id, patient_id=make_user('patient').id,
+                              datetime=datetime(2030, 1, 1, 9))
+    db.session.add(appointment)
+    db.session.commit()
+    assert stats.get_dashboard_stats(db.session)['appointments_by_status'] == {'pending': 1}
+
+    appointment.notes = 'bring referral'
+    db.session.commit()
+    assert cached()
+
+    appointment.status = 'confirmed'
+    db.session.commit()
+    assert stats.get_dashboard_stats(db.session)['appointments_by_status'] == {'confirmed': 1}